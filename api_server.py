@@ -0,0 +1,234 @@
+"""
+DeckIQ local analysis API - runs the analysis core without Streamlit.
+
+Endpoints:
+    POST /jobs?type=pdf&analyses=structure,one_pager&template=y_combinator&priority=batch
+         body: raw deck bytes             -> 202 {"job_id": "..."}
+         (priority: batch or prefetch; callers are identified by address, or by
+          X-DeckIQ-User / X-Forwarded-For from DECKIQ_TRUSTED_PROXIES;
+          profile=1 adds a per-stage profile to the job and writes a flamegraph file
+          when DECKIQ_PROFILE_ALLOW_QUERY is set)
+    GET  /jobs/<job_id>                   -> job status, progress and results
+    GET  /health                          -> {"status": "ok", "keys": [per-key health], ...}
+    GET  /prompts                         -> per-variant prompt latency/token stats
+    GET  /scheduler                       -> queue depth and wait-time gauges per priority
+    GET  /search?q=burn+rate&kind=design&limit=20
+                                          -> ranked archive hits with highlighted snippets
+    GET  /archive/<entry_id>              -> one archived deck text or output in full
+         (both only cover decks the caller uploaded, unless the caller is in
+          DECKIQ_ARCHIVE_ADMINS)
+    GET  /quota                           -> the caller's daily token budget, usage and remaining
+
+Requests return immediately; analyses run on a worker pool, so several API
+processes can sit behind a load balancer independently of the UI pods.
+
+Usage:
+    export GOOGLE_API_KEY="your_api_key_here"   # or GOOGLE_API_KEYS="key1,key2,..." to pool keys
+    python api_server.py  # DECKIQ_API_HOST / DECKIQ_API_PORT / DECKIQ_API_WORKERS
+"""
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from utils.analysis_archive import AnalysisArchive, search_scope
+from utils.analysis_core import ANALYSES, DeckAnalyzer, JobStore, TEMPLATE_NAMES, api_key_list, load_model
+from utils.dedup_index import DedupIndex
+from utils.gemini_helper import GeminiHelper
+from utils.profiling import query_allowed
+from utils.prompt_registry import get_prompt_registry
+from utils.quota import get_token_ledger, client_identity
+from utils.scheduler import get_scheduler, BATCH, PREFETCH
+from utils.upload_guard import max_upload_bytes
+
+
+MAX_BODY_BYTES = max_upload_bytes()
+
+
+class ModelHolder:
+    """Loads the Gemini model (or a ClientPool over several keys) once, on the first job"""
+
+    def __init__(self, api_keys):
+        self.api_keys = api_keys
+        self.model = None
+        self.model_name = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        with self.lock:
+            if self.model is None:
+                self.model, self.model_name = load_model(self.api_keys)
+        return self.model, self.model_name
+
+    def key_status(self):
+        """Per-key health when requests are pooled over several keys"""
+        status = getattr(self.model, "status", None)
+        return status() if status else []
+
+
+class DeckIQRequestHandler(BaseHTTPRequestHandler):
+    server_version = "DeckIQ/1.0"
+    jobs = None
+    models = None
+    archive = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _user(self):
+        """Caller identity for fair sharing and token budgets (see client_identity)"""
+        return client_identity(self.client_address[0], self.headers)
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/health":
+            self._send_json(200, {"status": "ok", "jobs": len(self.jobs.jobs), "keys": self.models.key_status()})
+            return
+        if path == "/prompts":
+            self._send_json(200, {"prompts": get_prompt_registry().summary()})
+            return
+        if path == "/scheduler":
+            self._send_json(200, get_scheduler().stats())
+            return
+        if path == "/quota":
+            self._send_json(200, get_token_ledger().status(self._user()))
+            return
+        if path == "/search":
+            self._search(parse_qs(urlparse(self.path).query))
+            return
+        if path.startswith("/archive/"):
+            entry_id = path.split("/")[-1]
+            entry = self.archive.entry(int(entry_id), search_scope(self._user())) if entry_id.isdigit() else None
+            if entry is None:
+                self._send_json(404, {"error": "Unknown archive entry"})
+            else:
+                self._send_json(200, entry)
+            return
+        if path.startswith("/jobs/"):
+            job = self.jobs.get(path.split("/")[-1])
+            if job is None:
+                self._send_json(404, {"error": "Unknown job id"})
+            else:
+                self._send_json(200, job)
+            return
+        self._send_json(404, {"error": "Not found"})
+
+    def _search(self, params):
+        query = params.get("q", [""])[0].strip()
+        if not query:
+            self._send_json(400, {"error": "q must not be empty"})
+            return
+        kinds = [k for k in params.get("kind", [""])[0].split(",") if k]
+        try:
+            limit = min(100, max(1, int(params.get("limit", ["20"])[0])))
+        except ValueError:
+            self._send_json(400, {"error": "limit must be an integer"})
+            return
+        started = time.perf_counter()
+        hits = self.archive.search(query, kinds, limit, search_scope(self._user()))
+        self._send_json(200, {
+            "query": query,
+            "hits": hits,
+            "milliseconds": round((time.perf_counter() - started) * 1000, 2),
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        params = parse_qs(url.query)
+        file_type = params.get("type", ["pdf"])[0].lower()
+        analyses = params.get("analyses", [",".join(ANALYSES)])[0].split(",")
+        template_key = params.get("template", ["y_combinator"])[0]
+        priority = params.get("priority", [BATCH])[0]
+        profile = (query_allowed() and params.get("profile", [""])[0] == "1") or None
+        user = self._user()
+
+        if file_type not in ("pdf", "pptx"):
+            self._send_json(400, {"error": "type must be pdf or pptx"})
+            return
+        unknown = [a for a in analyses if a not in ANALYSES]
+        if unknown:
+            self._send_json(400, {"error": f"Unknown analyses: {', '.join(unknown)}"})
+            return
+        if template_key not in TEMPLATE_NAMES:
+            self._send_json(400, {"error": f"Unknown template: {template_key}"})
+            return
+        # Interactive priority is reserved for people using the Streamlit UI
+        if priority not in (BATCH, PREFETCH):
+            self._send_json(400, {"error": "priority must be batch or prefetch"})
+            return
+
+        # Don't queue work whose model calls would all be rejected by the token budget
+        quota = get_token_ledger().status(user)
+        if quota["remaining"] == 0:
+            self._send_json(429, {"error": "Daily token budget exhausted", "quota": quota})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            self._send_json(400, {"error": "Request body must contain the deck file"})
+            return
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": f"Deck exceeds {MAX_BODY_BYTES // (1024 * 1024)}MB limit"})
+            return
+
+        data = self.rfile.read(length)
+        job_id = self.jobs.submit(data, file_type, analyses, template_key, priority, user, profile)
+        self._send_json(202, {"job_id": job_id, "status_url": f"/jobs/{job_id}"})
+
+
+def create_server(host, port, api_keys, workers):
+    """Build the HTTP server and its job store"""
+    holder = ModelHolder(api_keys)
+    dedup = DedupIndex()
+    # Batch jobs archive many outputs; buffer them into fewer transactions (searches flush first)
+    archive = AnalysisArchive(batch_size=int(os.getenv("DECKIQ_ARCHIVE_BATCH", "50")))
+
+    def analyzer_factory():
+        return DeckAnalyzer(GeminiHelper(model_loader=holder.get), dedup=dedup, archive=archive)
+
+    handler = type("Handler", (DeckIQRequestHandler,), {
+        "jobs": JobStore(analyzer_factory, max_workers=workers),
+        "models": holder,
+        "archive": archive,
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    api_keys = api_key_list(os.getenv("GOOGLE_API_KEYS"), os.getenv("GOOGLE_API_KEY"))
+    if not api_keys:
+        print("❌ GOOGLE_API_KEY not found in environment variables")
+        return
+
+    host = os.getenv("DECKIQ_API_HOST", "127.0.0.1")
+    port = int(os.getenv("DECKIQ_API_PORT", "8600"))
+    workers = int(os.getenv("DECKIQ_API_WORKERS", "4"))
+
+    # Module loggers (profiles, portfolio compaction, ...) report on stderr
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    server = create_server(host, port, api_keys, workers)
+    print(f"🚀 DeckIQ API listening on http://{host}:{port} ({workers} workers, {len(api_keys)} API key(s))")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.RequestHandlerClass.jobs.shutdown()
+        server.RequestHandlerClass.archive.flush()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,32 @@
+from utils import import_profiler
+import_profiler.install_from_env()
+
 import streamlit as st
-import google.generativeai as genai
-import fitz  # PyMuPDF
-from pptx import Presentation
-import json
-import pandas as pd
-import plotly.express as px
+from utils.analysis_archive import get_analysis_archive, GAPS
+from utils.analysis_core import api_key_list, load_model, extract_deck_text
+from utils.dedup_index import DedupIndex
+from utils.fact_extractor import extract_facts, format_value, METRIC_LABELS
+from utils.ocr import ocr_available, ocr_enabled
+from utils.portfolio_store import get_portfolio_store
+from utils.profiling import enabled_from_env, query_allowed, profile_run, stage
+from utils.quota import get_token_ledger, streamlit_user_id, BUDGET_ERROR
+from utils.session_memory import SessionArtifactStore
+from utils.slide_renderer import get_slide_renderer, image_token_budget, IMAGE_TOKENS
+from utils.upload_guard import UploadRejected, check_upload_size, MAX_UPLOAD_MB
 from utils.gemini_helper import GeminiHelper
+from utils.markdown_sections import SectionParser
+from utils.scheduler import get_scheduler, INTERACTIVE
 from utils.template_checker import TemplateChecker
 import os
-import io
+import json
+import logging
+import time
+
+# Heavy dependencies (google.generativeai, PyMuPDF, python-pptx) are imported
+# inside the code paths that need them to keep cold starts and reruns fast.
+
 
+logger = logging.getLogger(__name__)
 
 # Configure Streamlit page
 st.set_page_config(
@@ -34,57 +51,44 @@ div[data-testid="stStatusWidget"] {display: none;}
 st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
 
-# Updated Gemini models (current as of October 2025)
-GEMINI_MODELS = [
-    "gemini-2.5-flash",        # Latest and fastest
-    "gemini-2.0-flash",        # Stable fallback
-    "gemini-1.5-flash-002",    # Legacy support
-]
+def get_api_key():
+    """Read the API key from Streamlit secrets or the environment"""
+    try:
+        api_key = st.secrets.get("GOOGLE_API_KEY")
+    except FileNotFoundError:
+        api_key = None
+    return api_key or os.getenv("GOOGLE_API_KEY")
+
+
+def get_api_keys():
+    """All configured keys: GOOGLE_API_KEYS (secrets list or comma-separated env) plus GOOGLE_API_KEY"""
+    try:
+        pooled = st.secrets.get("GOOGLE_API_KEYS")
+    except FileNotFoundError:
+        pooled = None
+    return api_key_list(pooled or os.getenv("GOOGLE_API_KEYS"), get_api_key())
 
 
 @st.cache_resource
 def init_gemini():
     """Initialize Gemini with proper error handling and model selection"""
-    api_key = st.secrets.get("GOOGLE_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    api_keys = get_api_keys()
     
-    if not api_key:
+    if not api_keys:
         st.error("⚠️ Please set GOOGLE_API_KEY in Streamlit secrets or environment variables")
         st.info("Get your free API key from: https://aistudio.google.com/")
         return None, None
 
     try:
-        genai.configure(api_key=api_key)
-
-        # List available models
-        try:
-            available_models = [m.name.split('/')[-1] for m in genai.list_models()]
-            st.sidebar.success("✅ Connected to Gemini API")
-            st.sidebar.info(f"Available models: {len(available_models)}")
-        except Exception as e:
-            st.sidebar.warning(f"Could not list models: {str(e)}")
-            available_models = []
-
-        # Try each model until one works
-        for model_name in GEMINI_MODELS:
-            try:
-                model = genai.GenerativeModel(model_name)
-                # Test the model with a simple prompt
-                test_response = model.generate_content(
-                    "Respond with 'OK'",
-                    generation_config=genai.GenerationConfig(
-                        temperature=0.1,
-                        max_output_tokens=10
-                    )
-                )
-                if test_response.text:
-                    st.sidebar.success(f"🤖 Active model: **{model_name}**")
-                    return model, model_name
-            except Exception as e:
-                # Don't show error messages in sidebar - just try next model
-                continue
-
-        # If no models work, show error
-        st.error("❌ Could not initialize any Gemini model. Please check your API key.")
+        model, model_name = load_model(api_keys)
+        st.sidebar.success("✅ Connected to Gemini API")
+        st.sidebar.success(f"🤖 Active model: **{model_name}**")
+        if len(api_keys) > 1:
+            st.sidebar.success(f"🔑 {len(api_keys)} API keys pooled")
+        return model, model_name
+
+    except RuntimeError as e:
+        st.error(f"❌ {str(e)}")
         st.info("💡 Visit https://aistudio.google.com/ to verify your API key is active")
         return None, None
 
@@ -96,12 +100,11 @@ def init_gemini():
 def extract_text_from_pdf(file):
     """Extract text from PDF file"""
     try:
-        doc = fitz.open(stream=file.read(), filetype="pdf")
-        text = ""
-        for page in doc:
-            text += page.get_text() + "\n"
-        doc.close()
-        return text
+        check_upload_size(file.size)
+        return extract_deck_text(file.read(), "pdf")
+    except UploadRejected as e:
+        st.error(f"❌ Upload rejected: {str(e)}")
+        return ""
     except Exception as e:
         st.error(f"Error extracting PDF text: {str(e)}")
         return ""
@@ -110,18 +113,164 @@ def extract_text_from_pdf(file):
 def extract_text_from_pptx(file):
     """Extract text from PowerPoint file"""
     try:
-        prs = Presentation(io.BytesIO(file.read()))
-        text = ""
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text += shape.text + "\n"
-        return text
+        check_upload_size(file.size)
+        return extract_deck_text(file.read(), "pptx")
+    except UploadRejected as e:
+        st.error(f"❌ Upload rejected: {str(e)}")
+        return ""
     except Exception as e:
         st.error(f"Error extracting PPTX text: {str(e)}")
         return ""
 
 
+@st.cache_resource
+def get_artifact_store():
+    """Process-wide, memory-budgeted store for per-session artifacts"""
+    return SessionArtifactStore()
+
+
+def prune_ended_sessions(artifacts):
+    """Release the artifacts of sessions whose browser tab has gone away"""
+    from streamlit import runtime
+
+    if runtime.exists():
+        artifacts.prune(runtime.get_instance().is_active_session)
+
+
+def get_session_id():
+    """Current Streamlit session id"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "default"
+
+
+def show_token_budget(placeholder, user):
+    """Remaining daily token budget for this user"""
+    status = get_token_ledger().status(user)
+    if status["remaining"] is None:
+        placeholder.caption(f"🎟️ Tokens used today: {status['used']:,}")
+    else:
+        placeholder.caption(
+            f"🎟️ Token budget: {status['remaining']:,} of {status['budget']:,} left today "
+            f"(resets in {status['resets_in'] // 3600}h)"
+        )
+
+
+@st.cache_resource
+def get_dedup_index():
+    """Process-wide near-duplicate deck index"""
+    return DedupIndex()
+
+
+def record_portfolio(record, *args):
+    """Append to the portfolio dataset; analytics failures never block an analysis"""
+    try:
+        with stage("portfolio_record"):
+            record(*args)
+    except Exception as e:
+        logger.warning("Portfolio store write failed: %s", e)
+
+
+def register_deck(deck_text):
+    """Index the deck once per session; returns (deck_id, closest prior match or None)"""
+    key = hash(deck_text)
+    registration = st.session_state.get("dedup_registration")
+    if not registration or registration[0] != key:
+        with stage("dedup_register"):
+            registration = (key, get_dedup_index().register(deck_text))
+        st.session_state["dedup_registration"] = registration
+    return registration[1]
+
+
+def show_key_metrics(deck_text):
+    """Render locally extracted metrics instantly, without a model call"""
+    facts = extract_facts(deck_text)
+    if not facts:
+        return
+
+    headline = [m for m in ('mrr', 'arr', 'revenue', 'customers', 'users', 'tam', 'growth', 'raise') if m in facts][:6]
+    st.markdown("#### 🔢 Key Metrics")
+    for col, metric in zip(st.columns(len(headline)), headline):
+        col.metric(METRIC_LABELS[metric], format_value(facts.get(metric)))
+
+    with st.expander("🧮 All extracted facts"):
+        st.table([
+            {"Metric": METRIC_LABELS[f.metric], "Value": format_value(f), "Source": f.raw}
+            for f in facts.facts
+        ])
+
+
+def show_progress(stage, message):
+    """Forward analysis progress from GeminiHelper to the UI"""
+    if stage == "retry":
+        st.warning(message)
+
+
+class SectionedOutput:
+    """
+    Progressive view of a long Markdown output. As the model streams, each
+    completed ##/### section is rendered into its own collapsible block
+    (with a download of just that section) while the section still being
+    written shows below it, instead of one st.markdown at the end.
+    """
+
+    def __init__(self, placeholder, file_prefix):
+        self.placeholder = placeholder
+        self.file_prefix = file_prefix
+        # Never reset, so widgets re-rendered after a restarted stream get fresh keys
+        self.rendered = 0
+        self._start()
+
+    def _start(self):
+        self.text = ""
+        self.parser = SectionParser()
+        self.number = 0
+        self.body = self.placeholder.container()
+        self.body.markdown("---")
+        self.live = self.body.empty()
+
+    def update(self, text):
+        """on_stream callback: text is the whole output so far"""
+        if not text.startswith(self.text):
+            self._start()  # A retried call streams from the beginning again
+        chunk = text[len(self.text):]
+        self.text = text
+        for section in self.parser.feed(chunk):
+            self._render(section)
+        self.live.markdown(self.parser.pending + " ▌")
+
+    def _render(self, section):
+        with self.live.container():
+            if section.title is None or not section.body.strip():
+                # Preamble and bare headings (e.g. a title above ### sections) stay inline
+                st.markdown(section.text)
+            else:
+                self.number += 1
+                with st.expander(section.title, expanded=True):
+                    st.markdown(section.body)
+                    st.download_button(
+                        "📥 Download section",
+                        section.text,
+                        file_name=f"{self.file_prefix}_section_{self.number}.md",
+                        mime="text/markdown",
+                        on_click="ignore",
+                        key=f"{self.file_prefix}_section_{self.rendered}"
+                    )
+        self.rendered += 1
+        self.live = self.body.empty()
+
+    def finish(self, output):
+        """Render the complete output; for cached outputs this renders every section at once"""
+        self.update(output)
+        for section in self.parser.finish():
+            self._render(section)
+        self.live.empty()
+
+    def clear(self):
+        self.placeholder.empty()
+
+
 def show_api_setup_guide():
     """Show detailed API setup guide"""
     st.markdown("""
@@ -149,8 +298,11 @@ def show_api_setup_guide():
     """)
 
 
-def show_analysis_error(feature_name):
+def show_analysis_error(feature_name, output=None):
     """Display error message for failed analysis"""
+    if output and output.startswith(BUDGET_ERROR):
+        st.warning(f"🎟️ {output[len('Error: '):]}")
+        return
     st.error(f"❌ Failed to generate {feature_name}. Please try again.")
     st.info("💡 **Troubleshooting tips:**\n- Check your internet connection\n- Verify API key is active\n- Try refreshing the page\n- Ensure your deck has readable text content")
 
@@ -176,9 +328,9 @@ def main():
         # API status section
         st.markdown("**⚙️ API Status**")
 
-    # Initialize Gemini
-    model, model_name = init_gemini()
-    if not model:
+    # The Gemini SDK is loaded and the model probed on the first generation
+    if not get_api_keys():
+        st.error("⚠️ Please set GOOGLE_API_KEY in Streamlit secrets or environment variables")
         show_api_setup_guide()
         return
 
@@ -187,19 +339,48 @@ def main():
     uploaded_file = st.file_uploader(
         "Choose your pitch deck file",
         type=["pdf", "pptx"],
-        help="Supported formats: PDF, PowerPoint (.pptx). Max size: 10MB"
+        help=f"Supported formats: PDF, PowerPoint (.pptx). Max size: {MAX_UPLOAD_MB:g}MB"
     )
 
     if uploaded_file:
-        # Extract text based on file type
-        with st.spinner("🔍 Extracting content from your deck..."):
-            if uploaded_file.type == "application/pdf":
-                deck_text = extract_text_from_pdf(uploaded_file)
-            else:  # pptx
-                deck_text = extract_text_from_pptx(uploaded_file)
+        # Extracted text is kept per session (within the process memory budget)
+        # so reruns don't re-read and re-parse the upload
+        session_id = get_session_id()
+        artifacts = get_artifact_store()
+        prune_ended_sessions(artifacts)
+        upload_key = ("deck_text", getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}:{uploaded_file.size}")
+        deck_text = artifacts.get(session_id, upload_key)
+        extract_seconds = 0.0
+
+        if deck_text is None:
+            # Extract text based on file type
+            with st.spinner("🔍 Extracting content from your deck..."):
+                extract_started = time.perf_counter()
+                if uploaded_file.type == "application/pdf":
+                    deck_text = extract_text_from_pdf(uploaded_file)
+                else:  # pptx
+                    deck_text = extract_text_from_pptx(uploaded_file)
+                extract_seconds = round(time.perf_counter() - extract_started, 3)
+            if deck_text:
+                artifacts.put(session_id, upload_key, deck_text)
+
+        st.sidebar.caption(
+            f"🧠 Session memory: {artifacts.usage(session_id) / 1024:.0f} KB "
+            f"(process: {artifacts.usage() / (1024 * 1024):.1f} MB)"
+        )
+        queue = get_scheduler().stats()
+        st.sidebar.caption(
+            f"🚦 Model queue: {queue['queued']} waiting, {queue['in_flight']}/{queue['slots']} running "
+            f"(interactive p95 wait {queue['classes'][INTERACTIVE]['wait_p95']:.1f}s)"
+        )
+        user_id = streamlit_user_id()
+        budget_caption = st.sidebar.empty()
+        show_token_budget(budget_caption, user_id)
 
         if len(deck_text.strip()) < 50:
             st.warning("⚠️ Limited text detected. Ensure your deck contains readable text.")
+            if uploaded_file.type == "application/pdf" and ocr_enabled() and not ocr_available():
+                st.caption("🔠 Scanned deck? Install Tesseract OCR on the server to read image-only slides.")
             
             with st.expander("📋 See example format"):
                 st.markdown("""
@@ -214,15 +395,52 @@ def main():
             return
 
         st.success(f"✅ Extracted {len(deck_text)} characters | {len(deck_text.split())} words")
+        show_key_metrics(deck_text)
 
         # Show preview
         with st.expander("👁️ Preview extracted content"):
             preview_text = deck_text[:800] + "..." if len(deck_text) > 800 else deck_text
             st.text_area("Content Preview", preview_text, height=200, disabled=True)
 
+        # Near-duplicate decks reuse earlier results instead of calling the model again
+        dedup = get_dedup_index()
+        deck_id, match = register_deck(deck_text)
+        if match and match[0] != deck_id and match[1] >= dedup.threshold:
+            st.info(f"♻️ Near-duplicate of a previously analyzed deck ({match[1]:.0%} similar). Cached results will be reused.")
+
         # Initialize helpers
-        helper = GeminiHelper(model, model_name)
+        helper = GeminiHelper(
+            model_loader=init_gemini, on_progress=show_progress,
+            priority=INTERACTIVE, user=user_id
+        )
         checker = TemplateChecker()
+        portfolio = get_portfolio_store()
+        archive = get_analysis_archive()
+
+        if st.session_state.get("portfolio_deck") != deck_id:
+            st.session_state["portfolio_deck"] = deck_id
+            archive.record_deck(deck_id, uploaded_file.name, deck_text, user_id)
+            file_type = "pdf" if uploaded_file.type == "application/pdf" else "pptx"
+            record_portfolio(
+                portfolio.record_upload,
+                deck_id, file_type, deck_text, checker, extract_facts(deck_text), extract_seconds
+            )
+
+        def cached(result_key, generate, analysis=None, kind=None):
+            started = time.perf_counter()
+            # Dedup cache first, then the archive, and only then the model
+            with stage(f"analysis:{kind or analysis}"):
+                output = dedup.get_or_compute(
+                    deck_id, match, result_key,
+                    lambda: archive.get_or_compute(deck_id, kind or analysis, result_key, generate)
+                )
+            if analysis:
+                ok = bool(output) and not output.startswith("Error")
+                record_portfolio(
+                    portfolio.record_analysis,
+                    deck_id, analysis, round(time.perf_counter() - started, 3), ok
+                )
+            return output
 
         # Analysis tabs
         tab1, tab2, tab3, tab4, tab5 = st.tabs([
@@ -236,10 +454,14 @@ def main():
             if st.button("🚀 Generate Structure", key="structure", type="primary"):
                 with st.spinner("🤖 Analyzing deck structure..."):
                     try:
-                        outline = helper.generate_structure(deck_text)
+                        view = SectionedOutput(st.empty(), "pitch_structure")
+                        outline = cached(
+                            helper.prompt_key("structure", deck_text),
+                            lambda: helper.generate_structure(deck_text, on_stream=view.update),
+                            "structure"
+                        )
                         if outline and "Error" not in outline:
-                            st.markdown("---")
-                            st.markdown(outline)
+                            view.finish(outline)
                             st.download_button(
                                 "📥 Download Structure",
                                 outline,
@@ -247,7 +469,8 @@ def main():
                                 mime="text/markdown"
                             )
                         else:
-                            show_analysis_error("structure analysis")
+                            view.clear()
+                            show_analysis_error("structure analysis", outline)
                     except Exception as e:
                         show_analysis_error("structure analysis")
 
@@ -258,7 +481,7 @@ def main():
             if st.button("🎯 Generate Script", key="script", type="primary"):
                 with st.spinner("✍️ Crafting your pitch script..."):
                     try:
-                        script = helper.generate_pitch_script(deck_text)
+                        script = cached(helper.prompt_key("pitch_script", deck_text), lambda: helper.generate_pitch_script(deck_text), "pitch_script")
                         if script and "Error" not in script:
                             st.markdown("---")
                             st.markdown(script)
@@ -269,7 +492,7 @@ def main():
                                 mime="text/markdown"
                             )
                         else:
-                            show_analysis_error("pitch script")
+                            show_analysis_error("pitch script", script)
                     except Exception as e:
                         show_analysis_error("pitch script")
 
@@ -277,10 +500,26 @@ def main():
             st.markdown("### 🎨 Design Suggestions")
             st.markdown("Get modern design recommendations for your slides")
 
+            is_pdf = uploaded_file.type == "application/pdf"
+            include_slides = st.checkbox(
+                "🖼️ Include slide thumbnails",
+                key="design_slides",
+                disabled=not is_pdf,
+                help=f"Attach low-resolution images of up to {image_token_budget() // IMAGE_TOKENS} slides "
+                     "so the advice reflects how the deck actually looks (PDF decks only)"
+            )
+
             if st.button("🎨 Get Design Tips", key="design", type="primary"):
                 with st.spinner("🎨 Analyzing design improvements..."):
                     try:
-                        design_tips = helper.generate_design_suggestions(deck_text)
+                        image_budget = image_token_budget() if include_slides and is_pdf else None
+
+                        def generate_design():
+                            # Thumbnails are rendered only on a cache miss, and only for the budgeted slides
+                            slides = get_slide_renderer().thumbnails(uploaded_file.getvalue(), image_budget) if image_budget else None
+                            return helper.generate_design_suggestions(deck_text, slides)
+
+                        design_tips = cached(helper.prompt_key("design", deck_text, image_budget), generate_design, "design")
                         if design_tips and "Error" not in design_tips:
                             st.markdown("---")
                             st.markdown(design_tips)
@@ -291,7 +530,7 @@ def main():
                                 mime="text/markdown"
                             )
                         else:
-                            show_analysis_error("design suggestions")
+                            show_analysis_error("design suggestions", design_tips)
                     except Exception as e:
                         show_analysis_error("design suggestions")
 
@@ -309,9 +548,15 @@ def main():
                 with st.spinner("📈 Comparing against best practices..."):
                     try:
                         template_key = template_choice.lower().replace(" ", "_")
-                        gaps = checker.check_template_gaps(deck_text, template_key)
-                        benchmark_analysis = helper.generate_benchmark_analysis(
-                            deck_text, gaps, template_choice
+                        gaps = json.loads(cached(
+                            f"gaps:{template_key}",
+                            lambda: json.dumps(checker.check_template_gaps(deck_text, template_key)),
+                            kind=GAPS
+                        ))
+                        benchmark_analysis = cached(
+                            f"{helper.prompt_key('benchmark', deck_text)}:{template_key}",
+                            lambda: helper.generate_benchmark_analysis(deck_text, gaps, template_choice),
+                            "benchmark"
                         )
 
                         if benchmark_analysis and "Error" not in benchmark_analysis:
@@ -351,7 +596,7 @@ def main():
                                 mime="text/markdown"
                             )
                         else:
-                            show_analysis_error("benchmark analysis")
+                            show_analysis_error("benchmark analysis", benchmark_analysis)
                     except Exception as e:
                         show_analysis_error("benchmark analysis")
 
@@ -362,10 +607,14 @@ def main():
             if st.button("📝 Generate One-Pager", key="onepager", type="primary"):
                 with st.spinner("📋 Creating executive summary..."):
                     try:
-                        summary = helper.generate_one_pager(deck_text)
+                        view = SectionedOutput(st.empty(), "executive_summary")
+                        summary = cached(
+                            helper.prompt_key("one_pager", deck_text),
+                            lambda: helper.generate_one_pager(deck_text, on_stream=view.update),
+                            "one_pager"
+                        )
                         if summary and "Error" not in summary:
-                            st.markdown("---")
-                            st.markdown(summary)
+                            view.finish(summary)
                             st.download_button(
                                 "📥 Download One-Pager",
                                 summary,
@@ -373,10 +622,14 @@ def main():
                                 mime="text/markdown"
                             )
                         else:
-                            show_analysis_error("one-pager")
+                            view.clear()
+                            show_analysis_error("one-pager", summary)
                     except Exception as e:
                         show_analysis_error("one-pager")
 
+        # Refresh after this run's analyses have settled their token usage
+        show_token_budget(budget_caption, user_id)
+
     else:
         # Welcome screen
         st.markdown("## 👋 Welcome to DeckIQ")
@@ -428,5 +681,24 @@ def main():
             """)
 
 
+def profiling_requested():
+    """Per-stage profiling via DECKIQ_PROFILE, or ?profile=1 on the app URL when DECKIQ_PROFILE_ALLOW_QUERY is set"""
+    return enabled_from_env() or (query_allowed() and st.query_params.get("profile") == "1")
+
+
+def show_profile(profile):
+    """Per-stage wall/CPU/peak-memory table for this script run"""
+    rows = profile.table()
+    if not rows:
+        return
+    with st.expander("⏱️ Stage profile (this run)"):
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+        if profile.paths:
+            st.caption(f"Flamegraph (collapsed stacks): `{profile.paths[0]}`")
+
+
 if __name__ == "__main__":
-    main()
+    with profile_run(f"session-{get_session_id()[:8]}", enabled=profiling_requested()) as profile:
+        main()
+    if profile is not None:
+        show_profile(profile)
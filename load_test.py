@@ -0,0 +1,389 @@
+"""
+Concurrent-session load test for the DeckIQ Streamlit app.
+
+Starts `streamlit run app.py` against a local fake Gemini model
+(DECKIQ_FAKE_GEMINI_LATENCY) and drives simulated sessions through it with
+a headless client speaking Streamlit's websocket protocol: open the app,
+upload a deck (extract), then click through every analysis. Concurrency is
+ramped level by level, reporting throughput, per-step latency percentiles
+and the server's memory growth.
+
+    python load_test.py --levels 1,2,4,8,16 --sessions 2 --latency 1.0
+
+Requires the `websockets` package (installed with recent Streamlit versions).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# (button key, step name) in the order a user would click through the tabs
+ANALYSIS_BUTTONS = [
+    ("structure", "structure"),
+    ("script", "pitch_script"),
+    ("design", "design"),
+    ("benchmark", "benchmark"),
+    ("onepager", "one_pager"),
+]
+
+SAMPLE_SLIDES = [
+    "Problem: 73% of small businesses can't afford 24/7 customer support",
+    "Solution: AI chatbot handling 90% of inquiries automatically",
+    "Market: $15B customer service automation market growing 25% annually",
+    "Traction: 150 customers, $45K MRR, 95% satisfaction, 12% MoM growth",
+    "Business Model: SaaS subscription at $299 per month, 80% gross margin",
+    "Competition: Zendesk and Intercom are built for enterprises, not SMBs",
+    "Team: Ex-Google and Stripe founders with 20 years combined experience",
+    "Ask: Raising $1.5M seed for engineering and sales expansion",
+]
+
+
+def server_environment(args, workdir):
+    """Fake model plus scratch-directory stores for the server process"""
+    env = dict(os.environ)
+    env.update({
+        "GOOGLE_API_KEY": env.get("GOOGLE_API_KEY") or "load-test",
+        "DECKIQ_FAKE_GEMINI_LATENCY": str(args.latency),
+        "DECKIQ_FAKE_GEMINI_JITTER": str(args.jitter),
+        "DECKIQ_FAKE_GEMINI_TOKENS": str(args.output_tokens),
+        "DECKIQ_FAKE_GEMINI_ERROR_RATE": str(args.error_rate),
+        "DECKIQ_REQUESTS_PER_MINUTE": str(args.rpm),
+        "DECKIQ_DEDUP_DB": os.path.join(workdir, "dedup.sqlite3"),
+        "DECKIQ_ARCHIVE_DB": os.path.join(workdir, "archive.sqlite3"),
+        "DECKIQ_QUOTA_DB": os.path.join(workdir, "quota.sqlite3"),
+        "DECKIQ_SCHEDULER_DB": os.path.join(workdir, "scheduler.sqlite3"),
+        "DECKIQ_PORTFOLIO_DIR": os.path.join(workdir, "portfolio"),
+        "DECKIQ_OUTPUT_STATS": os.path.join(workdir, "output_lengths.json"),
+    })
+    if args.keys > 1:
+        # Pooled fake keys, each with its own --rpm quota
+        env["GOOGLE_API_KEYS"] = ",".join(f"load-test-key-{i + 1}" for i in range(args.keys))
+    if not args.allow_cache:
+        # Every session's deck is unique anyway; a threshold above 1 also
+        # disables near-duplicate reuse so each analysis reaches the model
+        env["DECKIQ_DEDUP_THRESHOLD"] = "1.01"
+    return env
+
+
+def start_server(args, workdir):
+    """Launch the app headless and wait for its health check"""
+    command = [
+        sys.executable, "-m", "streamlit", "run", APP_PATH,
+        "--server.headless", "true",
+        "--server.port", str(args.port),
+        "--server.enableXsrfProtection", "false",
+        "--browser.gatherUsageStats", "false",
+    ]
+    log = open(os.path.join(workdir, "server.log"), "w")
+    process = subprocess.Popen(command, env=server_environment(args, workdir), stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Streamlit exited early; see {log.name}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{args.port}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f"Streamlit did not become healthy within 60s; see {log.name}")
+
+
+def build_deck(pages):
+    """A unique text PDF per session so extraction and caches see distinct decks"""
+    import fitz  # PyMuPDF
+
+    nonce = uuid.uuid4().hex[:8]
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        text = f"{SAMPLE_SLIDES[i % len(SAMPLE_SLIDES)]}\nSlide {i + 1} of deck {nonce}"
+        page.insert_textbox(fitz.Rect(50, 50, 550, 750), text, fontsize=14)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def rss_bytes(pid):
+    """Resident set size of a process (Linux /proc; None elsewhere)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(-(-pct * len(ordered) // 100)))
+    return ordered[rank - 1]
+
+
+class SessionClient:
+    """
+    Minimal headless Streamlit browser: one websocket session that reruns
+    the script with widget states and waits for each run to finish.
+    """
+
+    def __init__(self, ws, base_url, timeout):
+        self.ws = ws
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session_id = None
+        self.widgets = {}
+        self.uploader_state = None
+
+    def _send(self, back_msg):
+        self.ws.send(back_msg.SerializeToString())
+
+    def _receive(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = ForwardMsg()
+        msg.ParseFromString(self.ws.recv(timeout=self.timeout))
+        return msg
+
+    def rerun(self, trigger_id=None):
+        """Rerun the script with the current widget states; returns error messages from the run"""
+        from streamlit.proto.Alert_pb2 import Alert
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        back_msg = BackMsg()
+        client_state = back_msg.rerun_script
+        client_state.query_string = ""
+        if self.uploader_state is not None:
+            widget = client_state.widget_states.widgets.add()
+            widget.id = self.widgets["file_uploader"]
+            widget.file_uploader_state_value.CopyFrom(self.uploader_state)
+        if trigger_id:
+            widget = client_state.widget_states.widgets.add()
+            widget.id = trigger_id
+            widget.trigger_value = True
+        self._send(back_msg)
+
+        errors = []
+        while True:
+            msg = self._receive()
+            kind = msg.WhichOneof("type")
+            if kind == "new_session" and msg.new_session.initialize.session_id:
+                self.session_id = msg.new_session.initialize.session_id
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type in ("button", "file_uploader"):
+                    widget_id = getattr(element, element_type).id
+                    self.widgets[element_type if element_type == "file_uploader" else widget_id.rsplit("-", 1)[-1]] = widget_id
+                elif element_type == "exception":
+                    errors.append(f"{element.exception.type}: {element.exception.message}")
+                # Benchmark gaps are rendered as st.error too; they are results, not failures
+                elif element_type == "alert" and element.alert.format == Alert.ERROR and "Missing:" not in element.alert.body:
+                    errors.append(element.alert.body)
+            elif kind == "script_finished":
+                if msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return errors
+
+    def upload(self, name, data, mime):
+        """Request an upload URL, PUT the file and remember the uploader widget state"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.Common_pb2 import FileUploaderState
+
+        back_msg = BackMsg()
+        back_msg.file_urls_request.request_id = uuid.uuid4().hex
+        back_msg.file_urls_request.session_id = self.session_id
+        back_msg.file_urls_request.file_names.append(name)
+        self._send(back_msg)
+
+        while True:
+            msg = self._receive()
+            if msg.WhichOneof("type") == "file_urls_response":
+                file_urls = msg.file_urls_response.file_urls[0]
+                break
+
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{name}\"\r\n"
+            f"Content-Type: {mime}\r\n\r\n"
+        ).encode("utf-8") + data + f"\r\n--{boundary}--\r\n".encode("utf-8")
+        url = file_urls.upload_url if file_urls.upload_url.startswith("http") else self.base_url + file_urls.upload_url
+        request = urllib.request.Request(
+            url, data=body, method="PUT",
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        )
+        urllib.request.urlopen(request, timeout=self.timeout).close()
+
+        self.uploader_state = FileUploaderState()
+        info = self.uploader_state.uploaded_file_info.add()
+        info.file_id = file_urls.file_id
+        info.name = name
+        info.size = len(data)
+        info.file_urls.CopyFrom(file_urls)
+
+
+def run_session(args, base_url, timings, errors, lock):
+    """One simulated user: open the app, upload a deck, run every analysis"""
+
+    def step(name, action):
+        started = time.perf_counter()
+        try:
+            failed = action()
+        except Exception as e:
+            failed = [f"{type(e).__name__}: {e}"]
+        seconds = time.perf_counter() - started
+        with lock:
+            timings.setdefault(name, []).append(seconds)
+            if failed:
+                errors.append((name, str(failed[0])[:200]))
+        return not failed
+
+    from websockets.sync.client import connect
+
+    started = time.perf_counter()
+    ws_url = base_url.replace("http://", "ws://", 1) + "/_stcore/stream"
+    try:
+        with connect(ws_url, subprotocols=["streamlit"], max_size=None, open_timeout=args.timeout) as ws:
+            client = SessionClient(ws, base_url, args.timeout)
+            ok = step("load", lambda: client.rerun())
+
+            def upload():
+                client.upload("deck.pdf", build_deck(args.pages), "application/pdf")
+                return client.rerun()
+
+            ok = ok and step("upload", upload)
+            if ok:
+                for key, name in ANALYSIS_BUTTONS:
+                    if args.analyses and name not in args.analyses:
+                        continue
+                    step(name, lambda: client.rerun(client.widgets[key]))
+    except Exception as e:
+        with lock:
+            errors.append(("connect", f"{type(e).__name__}: {e}"[:200]))
+    finally:
+        with lock:
+            timings.setdefault("session", []).append(time.perf_counter() - started)
+
+
+def run_level(args, base_url, server_pid, concurrency):
+    """Run concurrency x sessions simulated sessions, concurrency at a time"""
+    timings = {}
+    errors = []
+    lock = threading.Lock()
+    rss_before = rss_bytes(server_pid)
+
+    def worker():
+        for _ in range(args.sessions):
+            run_session(args, base_url, timings, errors, lock)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, name=f"loadtest-{i}") for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    rss_after = rss_bytes(server_pid)
+
+    sessions = len(timings.get("session", []))
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "seconds": round(elapsed, 3),
+        "sessions_per_minute": round(sessions / elapsed * 60, 2) if elapsed else 0.0,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "rss_mb": round(rss_after / (1024 * 1024), 1) if rss_after else None,
+        "rss_growth_mb": round((rss_after - rss_before) / (1024 * 1024), 1) if rss_after and rss_before else None,
+        "steps": {
+            name: {
+                "count": len(values),
+                "mean": round(statistics.mean(values), 3),
+                "p50": round(percentile(values, 50), 3),
+                "p95": round(percentile(values, 95), 3),
+                "p99": round(percentile(values, 99), 3),
+            }
+            for name, values in timings.items()
+        },
+    }
+
+
+def print_level(result):
+    memory = f"RSS {result['rss_mb']}MB ({result['rss_growth_mb']:+}MB)" if result["rss_mb"] else "RSS n/a"
+    print(
+        f"\n== concurrency {result['concurrency']}: {result['sessions']} sessions in {result['seconds']}s "
+        f"| {result['sessions_per_minute']} sessions/min | errors {result['errors']} | {memory}"
+    )
+    print(f"   {'step':<14}{'count':>7}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, stats in result["steps"].items():
+        print(
+            f"   {name:<14}{stats['count']:>7}{stats['mean']:>9.3f}"
+            f"{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['p99']:>9.3f}"
+        )
+    for name, message in result["error_samples"]:
+        print(f"   ! {name}: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ramp concurrent DeckIQ sessions against a fake Gemini backend")
+    parser.add_argument("--levels", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--sessions", type=int, default=2, help="Sessions per simulated user at each level")
+    parser.add_argument("--analyses", default="", help="Comma-separated subset of analyses (default: all)")
+    parser.add_argument("--pages", type=int, default=12, help="Pages in each generated deck")
+    parser.add_argument("--latency", type=float, default=1.0, help="Fake model latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Fake model latency jitter in seconds")
+    parser.add_argument("--output-tokens", type=int, default=600, help="Fake model output length")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake model calls that fail")
+    parser.add_argument("--rpm", type=int, default=100000, help="DECKIQ_REQUESTS_PER_MINUTE (per key) for the server")
+    parser.add_argument("--keys", type=int, default=1, help="Number of fake API keys to pool")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the Streamlit server under test")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-step timeout in seconds")
+    parser.add_argument("--allow-cache", action="store_true", help="Keep near-duplicate result reuse enabled")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    args.analyses = [a for a in args.analyses.split(",") if a]
+
+    workdir = tempfile.mkdtemp(prefix="deckiq-loadtest-")
+    print(f"🧪 DeckIQ load test | fake latency {args.latency}s ±{args.jitter}s | scratch dir {workdir}")
+    server = start_server(args, workdir)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    results = []
+    try:
+        # One unmeasured session pays for first-run imports and model setup
+        run_session(args, base_url, {}, [], threading.Lock())
+        baseline = rss_bytes(server.pid)
+        for level in [int(n) for n in args.levels.split(",") if n]:
+            result = run_level(args, base_url, server.pid, level)
+            print_level(result)
+            results.append(result)
+        final = rss_bytes(server.pid)
+        if baseline and final:
+            print(f"\nServer RSS growth over the run: {(final - baseline) / (1024 * 1024):+.1f}MB")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "levels": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
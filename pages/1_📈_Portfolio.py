@@ -0,0 +1,124 @@
+import datetime
+
+import streamlit as st
+
+from utils.portfolio_store import get_portfolio_store, TEMPLATES, METRICS
+from utils.fact_extractor import METRIC_LABELS
+
+
+st.set_page_config(
+    page_title="DeckIQ - Portfolio Dashboard",
+    page_icon="📈",
+    layout="wide"
+)
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_rows(start, end, events):
+    """Scan the Parquet dataset once per filter combination (refreshed every minute)"""
+    return get_portfolio_store().load(start=start, end=end, events=events)
+
+
+def main():
+    st.title("📈 Portfolio Dashboard")
+    st.markdown("*Cross-deck analytics over every analyzed pitch deck*")
+
+    today = datetime.date.today()
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        date_range = st.date_input(
+            "📅 Date range",
+            (today - datetime.timedelta(days=30), today),
+            max_value=today
+        )
+    with col2:
+        template = st.selectbox(
+            "📋 Template",
+            TEMPLATES,
+            format_func=lambda key: key.replace("_", " ").title()
+        )
+
+    if not isinstance(date_range, tuple) or len(date_range) != 2:
+        st.info("Select a start and end date.")
+        return
+    start, end = (d.isoformat() for d in date_range)
+
+    with st.spinner("📊 Loading portfolio..."):
+        uploads = load_rows(start, end, ("upload",))
+        analyses = load_rows(start, end, None)
+
+    if uploads.empty:
+        st.info("No decks analyzed in this period yet. Upload a deck on the main page to get started.")
+        return
+
+    coverage = uploads[f"coverage_{template}"]
+    analyses = analyses[analyses["event"] != "upload"]
+
+    # Headline numbers
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Decks analyzed", f"{uploads['deck_id'].nunique():,}")
+    col2.metric("Avg coverage", f"{coverage.mean():.0f}%")
+    col3.metric("Fully covered", f"{(coverage >= 100).mean() * 100:.0f}%")
+    col4.metric("Analyses run", f"{len(analyses):,}")
+
+    st.markdown("---")
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("✅ Coverage distribution")
+        bins = list(range(0, 101, 10))
+        histogram = (
+            coverage.clip(upper=99.9)
+            .pipe(lambda s: s.groupby((s // 10 * 10).astype(int)).size())
+            .reindex(bins[:-1], fill_value=0)
+        )
+        histogram.index = [f"{b}-{b + 10}%" for b in histogram.index]
+        st.bar_chart(histogram)
+
+    with col2:
+        st.subheader("❌ Most commonly missing sections")
+        missing = uploads[f"missing_{template}"].explode().dropna().value_counts()
+        if missing.empty:
+            st.success("🎉 No missing sections in this period!")
+        else:
+            st.bar_chart((missing / len(uploads) * 100).rename("% of decks").head(10))
+
+    st.subheader("📈 Trends")
+    daily = uploads.groupby("date").agg(
+        decks=("deck_id", "nunique"),
+        coverage=(f"coverage_{template}", "mean")
+    )
+    col1, col2 = st.columns(2)
+    col1.line_chart(daily["decks"].rename("Decks per day"))
+    col2.line_chart(daily["coverage"].rename("Avg coverage %"))
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("🔢 Reported metrics")
+        metric_columns = [f"metric_{m}" for m in METRICS]
+        reported = uploads[metric_columns].notna().mean().mul(100).round(0)
+        medians = uploads[metric_columns].median()
+        st.dataframe(
+            {
+                "Metric": [METRIC_LABELS[m] for m in METRICS],
+                "% of decks reporting": reported.values,
+                "Median value": medians.values,
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+
+    with col2:
+        st.subheader("⏱️ Analysis latency")
+        if analyses.empty:
+            st.info("No analyses recorded yet.")
+        else:
+            latency = analyses.groupby("event")["seconds"].describe(percentiles=[0.5, 0.95])
+            latency["success rate"] = analyses.groupby("event")["ok"].mean() * 100
+            st.dataframe(
+                latency[["count", "50%", "95%", "success rate"]].round(2),
+                use_container_width=True
+            )
+
+
+main()
@@ -0,0 +1,71 @@
+import datetime
+import time
+
+import streamlit as st
+
+from utils.analysis_archive import get_analysis_archive, search_scope, DECK
+from utils.quota import streamlit_user_id
+
+
+st.set_page_config(
+    page_title="DeckIQ - Analysis Archive",
+    page_icon="🔎",
+    layout="wide"
+)
+
+
+def label(kind):
+    return "Deck text" if kind == DECK else kind.replace("_", " ").title()
+
+
+def main():
+    st.title("🔎 Analysis Archive")
+    archive = get_analysis_archive()
+    # Callers only see decks they uploaded; DECKIQ_ARCHIVE_ADMINS see everything
+    scope = search_scope(streamlit_user_id())
+    if scope is None:
+        st.markdown("*Full-text search over every analyzed deck and generated analysis*")
+    else:
+        st.markdown("*Full-text search over the decks you analyzed and their generated analyses*")
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        query = st.text_input("Search", placeholder="e.g. unit economics, churn, go-to-market")
+    with col2:
+        kinds = st.multiselect("Type", archive.kinds(scope), format_func=label)
+
+    if not query.strip():
+        st.info(f"{archive.count(scope):,} archived decks and analyses. Type to search.")
+        return
+
+    started = time.perf_counter()
+    hits = archive.search(query, kinds, limit=50, user=scope)
+    elapsed = (time.perf_counter() - started) * 1000
+    st.caption(f"{len(hits)} result{'s' if len(hits) != 1 else ''} in {elapsed:.1f} ms")
+
+    if not hits:
+        st.warning("No matches. Try fewer or different words.")
+        return
+
+    for hit in hits:
+        created = datetime.datetime.fromtimestamp(hit["created"]).strftime("%Y-%m-%d %H:%M")
+        deck = hit["deck_name"] or hit["deck_id"][:12]
+        with st.expander(f"{label(hit['kind'])} · {deck} · {created}"):
+            st.markdown(hit["snippet"])
+            if st.toggle("Show full text", key=f"full_{hit['id']}"):
+                entry = archive.entry(hit["id"], scope)
+                st.markdown("---")
+                if hit["kind"] == DECK:
+                    st.text(entry["body"])
+                else:
+                    st.markdown(entry["body"])
+                st.download_button(
+                    "📥 Download",
+                    entry["body"],
+                    file_name=f"{hit['kind']}_{hit['deck_id'][:12]}.md",
+                    mime="text/markdown",
+                    key=f"download_{hit['id']}"
+                )
+
+
+main()
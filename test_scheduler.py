@@ -0,0 +1,163 @@
+import os
+import tempfile
+import threading
+import time
+
+from utils.scheduler import FairScheduler, SharedSlots, Preempted, INTERACTIVE, PREFETCH, BATCH
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+def grant_order(scheduler, requests):
+    """Queue (priority, user) requests behind one held slot, then record the order they are granted in"""
+    holder = scheduler.acquire(INTERACTIVE, "holder")
+    order = []
+
+    def worker(priority, user):
+        with scheduler.admit(priority, user, timeout=5):
+            order.append((priority, user))
+
+    threads = [threading.Thread(target=worker, args=request) for request in requests]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: scheduler.stats()["queued"] == len(requests))
+    scheduler.release(holder)
+    for thread in threads:
+        thread.join()
+    return order
+
+
+def test_weighted_fair_queuing_between_classes():
+    scheduler = FairScheduler(slots=1, reserved=0, weights={INTERACTIVE: 3, PREFETCH: 2, BATCH: 1})
+    requests = [(BATCH, "b")] * 6 + [(PREFETCH, "p")] * 6 + [(INTERACTIVE, "i")] * 6
+    order = [priority for priority, _ in grant_order(scheduler, requests)]
+    first = order[:6]
+    assert first.count(INTERACTIVE) == 3
+    assert first.count(PREFETCH) == 2
+    assert first.count(BATCH) == 1
+
+
+def test_users_share_a_class_equally():
+    scheduler = FairScheduler(slots=1, reserved=0)
+    requests = [(BATCH, "big")] * 4 + [(BATCH, "small")] * 2
+    users = [user for _, user in grant_order(scheduler, requests)]
+    # One user's backlog doesn't hold the other back
+    assert users[:4].count("small") == 2
+
+
+def test_reserved_slots_only_go_to_interactive():
+    scheduler = FairScheduler(slots=2, reserved=1)
+    batch = scheduler.acquire(BATCH, "b")
+    try:
+        scheduler.acquire(PREFETCH, "p", timeout=0.1)
+        raise AssertionError("prefetch took the reserved slot")
+    except TimeoutError:
+        pass
+    interactive = scheduler.acquire(INTERACTIVE, "i", timeout=0.1)
+    scheduler.release(interactive)
+    scheduler.release(batch)
+    assert scheduler.stats()["in_flight"] == 0
+
+
+def test_full_queue_preempts_lower_class():
+    scheduler = FairScheduler(slots=1, reserved=0, max_queued=1)
+    holder = scheduler.acquire(INTERACTIVE, "holder")
+    outcome = {}
+
+    def batch_worker():
+        started = time.monotonic()
+        try:
+            scheduler.acquire(BATCH, "b", timeout=5)
+            outcome["batch"] = "granted"
+        except Preempted:
+            outcome["batch"] = "preempted"
+        outcome["waited"] = time.monotonic() - started
+
+    batch = threading.Thread(target=batch_worker)
+    batch.start()
+    wait_until(lambda: scheduler.stats()["queued"] == 1)
+
+    interactive = threading.Thread(target=lambda: scheduler.release(scheduler.acquire(INTERACTIVE, "i", timeout=5)))
+    interactive.start()
+    batch.join()
+    assert outcome["batch"] == "preempted"
+    # The displaced waiter is woken at once, not at its timeout
+    assert outcome["waited"] < 2
+
+    try:
+        scheduler.acquire(BATCH, "b2", timeout=1)
+        raise AssertionError("batch request joined a full queue")
+    except Preempted:
+        pass
+    scheduler.release(holder)
+    interactive.join()
+    assert scheduler.stats()["classes"][BATCH]["preempted"] == 2
+
+
+def test_shared_pool_spans_schedulers():
+    path = os.path.join(tempfile.mkdtemp(), "scheduler.sqlite3")
+    # Two schedulers with their own pool handles stand in for the app and the API server
+    app_pool = SharedSlots(path, slots=4, reserved=1)
+    api_pool = SharedSlots(path, slots=4, reserved=1)
+    app = FairScheduler(slots=1, reserved=0, shared=app_pool)
+    api = FairScheduler(slots=4, reserved=1, shared=api_pool)
+    try:
+        clicked = app.acquire(INTERACTIVE, "ui")
+        batch = api.acquire(BATCH, "research", timeout=1)
+
+        # A UI click waiting in the app process keeps API batch work off the pool
+        waiting = threading.Thread(target=lambda: app.release(app.acquire(INTERACTIVE, "ui2", timeout=5)))
+        waiting.start()
+        wait_until(lambda: api.stats()["shared"]["interactive_waiting"] == 1)
+        try:
+            api.acquire(BATCH, "research", timeout=0.3)
+            raise AssertionError("batch call admitted while interactive work waits in another process")
+        except TimeoutError:
+            pass
+
+        app.release(clicked)
+        waiting.join()
+        prefetch = api.acquire(PREFETCH, "research", timeout=1)
+        second = api.acquire(BATCH, "research", timeout=1)
+        assert api.stats()["shared"]["in_flight"] == {INTERACTIVE: 0, PREFETCH: 1, BATCH: 2}
+        # Three of four slots busy and one reserved: only interactive calls fit now
+        try:
+            api.acquire(BATCH, "research", timeout=0.3)
+            raise AssertionError("batch call took a reserved slot")
+        except TimeoutError:
+            pass
+        interactive = api.acquire(INTERACTIVE, "ui", timeout=1)
+
+        for ticket in (interactive, second, prefetch, batch):
+            api.release(ticket)
+        assert sum(app_pool.stats()["in_flight"].values()) == 0
+    finally:
+        app_pool.close()
+        api_pool.close()
+
+
+def test_expired_leases_return_to_the_pool():
+    path = os.path.join(tempfile.mkdtemp(), "scheduler.sqlite3")
+    crashed = SharedSlots(path, slots=1, reserved=0, lease_seconds=0.2)
+    survivor = SharedSlots(path, slots=1, reserved=0)
+    try:
+        assert crashed.lease(BATCH) is not None
+        crashed.stopped.set()  # the process dies without releasing
+        assert survivor.lease(INTERACTIVE) is None
+        wait_until(lambda: survivor.lease(INTERACTIVE) is not None)
+    finally:
+        crashed.close()
+        survivor.close()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -1,6 +1,27 @@
 # Utils module for Pitch Deck Enhancer
 """
 Utility modules for the Pitch Deck Enhancer Agent:
+- analysis_archive: SQLite FTS5 archive of decks and outputs with ranked, per-user full-text search
+- analysis_core: UI-free deck extraction, analysis runner and job store
+- client_pool: Multi-key Gemini client pool with per-key quota, health and failover
+- dedup_index: MinHash/LSH near-duplicate deck index with cached results
+- fake_gemini: Local stand-in for the Gemini model with configurable latency (load tests)
+- fact_extractor: Regex-based key metric extraction (MRR, TAM, raise, ...) cached per deck
 - gemini_helper: AI prompt handling and response generation with robust error handling
+- scheduler: Weighted fair-share admission of model calls across priorities, users and processes
+- session_memory: Memory budget split between per-session artifacts and byte-bounded shared caches
+- slide_renderer: Cached low-resolution slide thumbnails within an image-token budget
 - template_checker: Benchmark template comparison and gap analysis
+- generation_profiles: Per-analysis output caps tuned from recorded output lengths
+- markdown_sections: Incremental ##/### section splitting of streamed Markdown output
+- map_reduce: Page chunking and parallel per-chunk condensing for long documents
+- ocr: Selective, cached, parallel Tesseract OCR for PDF pages without a text layer
+- portfolio_store: Append-only date-partitioned Parquet dataset of per-deck results
+- profiling: Opt-in per-stage cProfile/tracemalloc profiling with flamegraph export (DECKIQ_PROFILE)
+- prompts / prompt_registry: Versioned, precompiled prompt templates with A/B variant stats
+- quota: Per-user daily token ledger with pre-flight admission control
+- rate_limiter: Process-wide token bucket for model requests
+- retry_policy: Deadline-aware retry policy with typed API error classification
+- upload_guard: Upload size, page-count and PPTX archive limits
+- import_profiler: Opt-in import timing (DECKIQ_IMPORT_PROFILE)
 """
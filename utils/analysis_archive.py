@@ -0,0 +1,281 @@
+import atexit
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+DECK = "deck"
+GAPS = "gaps"
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def archive_admins():
+    """Identities allowed to search every user's archive (DECKIQ_ARCHIVE_ADMINS, comma-separated)"""
+    return {user.strip() for user in os.getenv("DECKIQ_ARCHIVE_ADMINS", "").split(",") if user.strip()}
+
+
+def search_scope(user):
+    """The owner filter for a caller: None (everything) for archive admins, else the caller's own decks"""
+    return None if user in archive_admins() else user
+
+
+def to_fts_query(text):
+    """
+    Turn free text into a safe FTS5 query: every word quoted (so operators
+    and punctuation in user input can't cause syntax errors), all words
+    required, and the last word prefix-matched for search-as-you-type.
+    """
+    terms = _TERM_RE.findall(text or "")
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+class AnalysisArchive:
+    """
+    Local archive of every deck and analysis output, full-text searchable
+    through SQLite FTS5.
+
+    Entries live in `entries` (one row per deck text or (deck, result key)
+    output) and an external-content FTS5 index kept in sync by triggers.
+    Writes are buffered and flushed in batched transactions; reads and
+    searches see buffered entries. Stored outputs are served back for the
+    same deck and result key, so past analyses never need another model call.
+
+    `owners` records which users uploaded each deck. Reads take a `user`
+    and only see entries of that user's decks; user=None reads everything
+    (see search_scope).
+    """
+
+    def __init__(self, path=None, batch_size=1):
+        self.path = path or os.getenv("DECKIQ_ARCHIVE_DB", os.path.join(".deckiq", "archive.sqlite3"))
+        self.batch_size = batch_size
+        self.buffer = {}
+        self.owner_buffer = set()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                deck_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                result_key TEXT NOT NULL,
+                name TEXT NOT NULL DEFAULT '',
+                body TEXT NOT NULL,
+                created REAL NOT NULL,
+                UNIQUE (deck_id, result_key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_kind ON entries (kind);
+            CREATE TABLE IF NOT EXISTS owners (
+                deck_id TEXT NOT NULL,
+                user TEXT NOT NULL,
+                PRIMARY KEY (user, deck_id)
+            ) WITHOUT ROWID;
+            CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+                name, body, content='entries', content_rowid='id', tokenize='porter unicode61'
+            );
+            CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+                INSERT INTO entries_fts (rowid, name, body) VALUES (new.id, new.name, new.body);
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+                INSERT INTO entries_fts (entries_fts, rowid, name, body) VALUES ('delete', old.id, old.name, old.body);
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE ON entries BEGIN
+                INSERT INTO entries_fts (entries_fts, rowid, name, body) VALUES ('delete', old.id, old.name, old.body);
+                INSERT INTO entries_fts (rowid, name, body) VALUES (new.id, new.name, new.body);
+            END;
+        """)
+        # Persistent rank function: "ORDER BY rank" lets FTS5 sort internally and
+        # compute snippets only for the rows returned (name hits weigh 4x body hits)
+        self.conn.execute("INSERT INTO entries_fts (entries_fts, rank) VALUES ('rank', 'bm25(4.0, 1.0)')")
+        self.conn.commit()
+        atexit.register(self.flush)
+
+    def record_deck(self, deck_id, name, deck_text, user=None):
+        """Archive the extracted text of a deck uploaded by user; decks without an id aren't archived"""
+        if deck_id is None:
+            return
+        if user is not None:
+            with self.lock:
+                self.owner_buffer.add((deck_id, user))
+        self.append((deck_id, DECK, "", name or "", deck_text, time.time()))
+
+    def record_result(self, deck_id, kind, result_key, output, name=""):
+        """Archive one output (an analysis name or "gaps" as kind); error strings are skipped"""
+        if not output or output.startswith("Error"):
+            return
+        self.append((deck_id, kind, result_key, name, output, time.time()))
+
+    def append(self, entry):
+        with self.lock:
+            # Keyed by (deck_id, result_key) so a re-recorded output replaces the pending one
+            self.buffer[(entry[0], entry[2])] = entry
+            if len(self.buffer) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self.owner_buffer:
+            owners, self.owner_buffer = list(self.owner_buffer), set()
+            with self.conn:
+                self.conn.executemany("INSERT OR IGNORE INTO owners (deck_id, user) VALUES (?, ?)", owners)
+        if not self.buffer:
+            return
+        entries, self.buffer = list(self.buffer.values()), {}
+        self._insert_locked(entries)
+
+    def _insert_locked(self, entries):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO entries (deck_id, kind, result_key, name, body, created) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (deck_id, result_key) DO UPDATE SET "
+                "kind = excluded.kind, name = CASE WHEN excluded.name != '' THEN excluded.name ELSE name END, "
+                "body = excluded.body, created = excluded.created",
+                entries
+            )
+
+    def bulk_insert(self, entries, chunk_size=1000):
+        """
+        Insert many (deck_id, kind, result_key, name, body, created) tuples,
+        one transaction per chunk.
+        """
+        chunk = []
+        with self.lock:
+            self._flush_locked()
+            for entry in entries:
+                chunk.append(tuple(entry))
+                if len(chunk) >= chunk_size:
+                    self._insert_locked(chunk)
+                    chunk = []
+            if chunk:
+                self._insert_locked(chunk)
+
+    def get_result(self, deck_id, result_key):
+        """Archived output for a deck and result key, or None"""
+        with self.lock:
+            pending = self.buffer.get((deck_id, result_key))
+            if pending is not None:
+                return pending[4]
+            row = self.conn.execute(
+                "SELECT body FROM entries WHERE deck_id = ? AND result_key = ?",
+                (deck_id, result_key)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_or_compute(self, deck_id, kind, result_key, compute):
+        """Serve an archived output, or compute it and archive the result"""
+        if deck_id is None:
+            return compute()
+        value = self.get_result(deck_id, result_key)
+        if value is None:
+            value = compute()
+            self.record_result(deck_id, kind, result_key, value)
+        return value
+
+    @staticmethod
+    def _owned(user):
+        """SQL condition (and params) limiting entries e to user's decks"""
+        if user is None:
+            return "", []
+        return " AND e.deck_id IN (SELECT deck_id FROM owners WHERE user = ?)", [user]
+
+    def entry(self, entry_id, user=None):
+        """Full archived entry by id, or None (also when it isn't one of user's decks)"""
+        owned, owned_params = self._owned(user)
+        with self.lock:
+            self._flush_locked()
+            row = self.conn.execute(
+                "SELECT e.id, e.deck_id, e.kind, e.result_key, e.body, e.created, "
+                "(SELECT name FROM entries WHERE deck_id = e.deck_id AND kind = ?) "
+                "FROM entries e WHERE e.id = ?" + owned,
+                [DECK, entry_id, *owned_params]
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "deck_id", "kind", "result_key", "body", "created", "deck_name")
+        return dict(zip(keys, row))
+
+    def search(self, query, kinds=None, limit=20, user=None):
+        """
+        Ranked full-text search (bm25) over deck texts and outputs of user's
+        decks (all decks for user=None). Returns hit dicts with a
+        highlighted snippet, best match first.
+        """
+        match = to_fts_query(query)
+        if match is None:
+            return []
+
+        sql = (
+            "SELECT e.id, e.deck_id, e.kind, e.result_key, e.created, "
+            "snippet(entries_fts, 1, '**', '**', ' … ', 16), rank "
+            "FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid "
+            "WHERE entries_fts MATCH ?"
+        )
+        params = [match]
+        if kinds:
+            sql += f" AND e.kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+        owned, owned_params = self._owned(user)
+        sql += owned
+        params.extend(owned_params)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+
+        with self.lock:
+            self._flush_locked()
+            rows = self.conn.execute(sql, params).fetchall()
+            names = self._deck_names({row[1] for row in rows})
+        keys = ("id", "deck_id", "kind", "result_key", "created", "snippet", "rank")
+        hits = [dict(zip(keys, row)) for row in rows]
+        for hit in hits:
+            hit["deck_name"] = names.get(hit["deck_id"], "")
+        return hits
+
+    def _deck_names(self, deck_ids):
+        if not deck_ids:
+            return {}
+        rows = self.conn.execute(
+            f"SELECT deck_id, name FROM entries WHERE kind = ? AND deck_id IN ({','.join('?' * len(deck_ids))})",
+            [DECK, *deck_ids]
+        )
+        return dict(rows.fetchall())
+
+    def kinds(self, user=None):
+        """Entry kinds present in the archive (of user's decks), for search filters"""
+        owned, params = self._owned(user)
+        with self.lock:
+            self._flush_locked()
+            rows = self.conn.execute(f"SELECT DISTINCT kind FROM entries e WHERE 1{owned} ORDER BY kind", params)
+            return [row[0] for row in rows]
+
+    def count(self, user=None):
+        owned, params = self._owned(user)
+        with self.lock:
+            self._flush_locked()
+            return self.conn.execute(f"SELECT COUNT(*) FROM entries e WHERE 1{owned}", params).fetchone()[0]
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_analysis_archive():
+    """Process-wide AnalysisArchive, shared by the app and the archive page so they use one connection"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = AnalysisArchive()
+        return _shared
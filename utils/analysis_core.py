@@ -0,0 +1,347 @@
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from utils.analysis_archive import GAPS
+from utils.dedup_index import deck_fingerprint
+from utils.map_reduce import PAGE_BREAK
+from utils.ocr import get_page_ocr, needs_ocr, ocr_available, ocr_enabled
+from utils.profiling import profile_run, profiled, stage
+from utils.scheduler import BATCH
+from utils.template_checker import TemplateChecker
+from utils.upload_guard import check_page_count, check_pptx_archive, check_upload_size
+
+
+# Updated Gemini models (current as of October 2025)
+GEMINI_MODELS = [
+    "gemini-2.5-flash",        # Latest and fastest
+    "gemini-2.0-flash",        # Stable fallback
+    "gemini-1.5-flash-002",    # Legacy support
+]
+
+ANALYSES = ["structure", "pitch_script", "design", "benchmark", "one_pager"]
+
+TEMPLATE_NAMES = {
+    "y_combinator": "Y Combinator",
+    "sequoia_capital": "Sequoia Capital",
+}
+
+
+def api_key_list(pooled=None, primary=None):
+    """
+    Combine GOOGLE_API_KEYS (list or comma-separated string) and
+    GOOGLE_API_KEY into one de-duplicated list, primary key first.
+    """
+    if isinstance(pooled, str):
+        pooled = pooled.split(",")
+    keys = [key.strip() for key in (pooled or []) if key and key.strip()]
+    if primary and primary not in keys:
+        keys.insert(0, primary)
+    return list(dict.fromkeys(keys))
+
+
+def _probe_model(api_key, model_names):
+    """Return (model, model_name) for the first model answering with this key, or None"""
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+
+    for model_name in model_names:
+        try:
+            model = genai.GenerativeModel(model_name)
+            test_response = model.generate_content(
+                "Respond with 'OK'",
+                generation_config=genai.GenerationConfig(
+                    temperature=0.1,
+                    max_output_tokens=10
+                )
+            )
+            if test_response.text:
+                return model, model_name
+        except Exception:
+            continue
+    return None
+
+
+def load_model(api_key, model_names=GEMINI_MODELS):
+    """
+    Configure the Gemini SDK and return (model, model_name) for the first
+    model that answers a probe prompt. Raises RuntimeError if none work.
+
+    api_key may also be a list of keys: the first working key picks the
+    model, and with more than one key a ClientPool spreading requests over
+    all of them is returned in place of the model.
+    With DECKIQ_FAKE_GEMINI_LATENCY set, a local fake model is returned
+    instead (load testing and offline development).
+    """
+    from utils.client_pool import ClientPool, mask_key
+
+    api_keys = [api_key] if isinstance(api_key, str) else list(api_key)
+
+    if os.getenv("DECKIQ_FAKE_GEMINI_LATENCY"):
+        from utils.fake_gemini import FakeGenerativeModel
+        if len(api_keys) > 1:
+            models = [(f"key-{i + 1} ({mask_key(key)})", FakeGenerativeModel.from_env()) for i, key in enumerate(api_keys)]
+            return ClientPool(models, model_name="fake-gemini"), "fake-gemini"
+        return FakeGenerativeModel.from_env(), "fake-gemini"
+
+    for key in api_keys:
+        probed = _probe_model(key, model_names)
+        if probed is None:
+            continue
+        model, model_name = probed
+        if len(api_keys) > 1:
+            return ClientPool.from_keys(api_keys, model_name), model_name
+        return model, model_name
+
+    raise RuntimeError("Could not initialize any Gemini model. Please check your API key.")
+
+
+@profiled("extract_pdf")
+def extract_text_from_pdf_bytes(data):
+    """Extract text from PDF bytes"""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        check_page_count(doc.page_count)
+        pages = [page.get_text() for page in doc]
+
+        # Scanned or image-exported slides have no text layer: OCR just those pages
+        if ocr_enabled():
+            scanned = [number for number, text in enumerate(pages) if needs_ocr(doc[number], text)]
+            if scanned and ocr_available():
+                for number, text in get_page_ocr().recognize(data, doc, scanned).items():
+                    pages[number] = text
+
+        return "".join(text + "\n" + PAGE_BREAK for text in pages)
+    finally:
+        doc.close()
+
+
+@profiled("extract_pptx")
+def extract_text_from_pptx_bytes(data):
+    """Extract text from PowerPoint bytes"""
+    from pptx import Presentation
+
+    check_pptx_archive(data)
+    prs = Presentation(io.BytesIO(data))
+    text = ""
+    for slide in prs.slides:
+        for shape in slide.shapes:
+            if hasattr(shape, "text"):
+                text += shape.text + "\n"
+        text += PAGE_BREAK
+    return text
+
+
+def extract_deck_text(data, file_type):
+    """
+    Extract text from an uploaded deck; file_type is 'pdf' or 'pptx'.
+    Raises UploadRejected if the deck exceeds the configured limits.
+    """
+    check_upload_size(len(data))
+    if file_type == "pdf":
+        return extract_text_from_pdf_bytes(data)
+    if file_type == "pptx":
+        return extract_text_from_pptx_bytes(data)
+    raise ValueError(f"Unsupported file type: {file_type}")
+
+
+class DeckAnalyzer:
+    """
+    Runs the DeckIQ analyses without any UI dependency.
+
+    Progress is reported through on_progress(stage, message) so callers can
+    forward it to Streamlit, a job store or a log.
+    """
+
+    def __init__(self, helper, checker=None, dedup=None, archive=None):
+        self.helper = helper
+        self.checker = checker or TemplateChecker()
+        # Optional DedupIndex: near-duplicate decks reuse earlier outputs
+        self.dedup = dedup
+        # Optional AnalysisArchive: every output is archived and searchable,
+        # and archived outputs are served instead of calling the model again
+        self.archive = archive
+        self._registered = {}
+
+    def _deck(self, deck_text):
+        """(deck_id, closest prior match) for this deck, registered once per analyzer"""
+        key = hash(deck_text)
+        if key not in self._registered:
+            if self.dedup is not None:
+                self._registered[key] = self.dedup.register(deck_text)
+            else:
+                self._registered[key] = (deck_fingerprint(deck_text), None)
+            if self.archive is not None:
+                self.archive.record_deck(self._registered[key][0], "", deck_text, self.helper.user)
+        return self._registered[key]
+
+    def _cached(self, deck_text, kind, result_key, compute):
+        if self.dedup is None and self.archive is None:
+            return compute()
+        deck_id, match = self._deck(deck_text)
+        if self.archive is not None:
+            compute = partial(self.archive.get_or_compute, deck_id, kind, result_key, compute)
+        if self.dedup is None:
+            return compute()
+        return self.dedup.get_or_compute(deck_id, match, result_key, compute)
+
+    def run(self, analysis, deck_text, template_key="y_combinator", on_progress=None):
+        """Run a single analysis and return a result dict"""
+        if analysis not in ANALYSES:
+            raise ValueError(f"Unknown analysis: {analysis}")
+
+        on_progress = on_progress or (lambda stage, message: None)
+        self.helper.on_progress = on_progress
+        on_progress("start", f"Running {analysis}")
+        started = time.perf_counter()
+
+        result = {"analysis": analysis}
+        if analysis == "structure":
+            output = self._cached(
+                deck_text, analysis, self.helper.prompt_key(analysis, deck_text),
+                lambda: self.helper.generate_structure(deck_text)
+            )
+        elif analysis == "pitch_script":
+            output = self._cached(
+                deck_text, analysis, self.helper.prompt_key(analysis, deck_text),
+                lambda: self.helper.generate_pitch_script(deck_text)
+            )
+        elif analysis == "design":
+            output = self._cached(
+                deck_text, analysis, self.helper.prompt_key(analysis, deck_text),
+                lambda: self.helper.generate_design_suggestions(deck_text)
+            )
+        elif analysis == "one_pager":
+            output = self._cached(
+                deck_text, analysis, self.helper.prompt_key(analysis, deck_text),
+                lambda: self.helper.generate_one_pager(deck_text)
+            )
+        else:
+            gaps = json.loads(self._cached(
+                deck_text, GAPS, f"gaps:{template_key}",
+                lambda: json.dumps(self.checker.check_template_gaps(deck_text, template_key))
+            ))
+            total = len(self.checker.templates[template_key]['required_sections'])
+            result["template"] = template_key
+            result["missing_sections"] = gaps
+            result["coverage"] = round((total - len(gaps)) / total * 100, 1)
+            output = self._cached(
+                deck_text, analysis, f"{self.helper.prompt_key(analysis, deck_text)}:{template_key}",
+                lambda: self.helper.generate_benchmark_analysis(
+                    deck_text, gaps, TEMPLATE_NAMES.get(template_key, template_key)
+                )
+            )
+
+        result["ok"] = bool(output) and not output.startswith("Error")
+        result["output"] = output
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        on_progress("done", f"Finished {analysis}")
+        return result
+
+    def run_many(self, analyses, deck_text, template_key="y_combinator", on_progress=None):
+        """Run several analyses in order, returning {analysis: result}"""
+        return {
+            analysis: self.run(analysis, deck_text, template_key, on_progress)
+            for analysis in analyses
+        }
+
+
+class JobStore:
+    """
+    Thread-safe in-memory job registry backed by a worker pool.
+    Finished jobs beyond max_jobs are evicted oldest-first.
+    """
+
+    def __init__(self, analyzer_factory, max_workers=4, max_jobs=1000):
+        self.analyzer_factory = analyzer_factory
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="deckiq-job")
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, data, file_type, analyses, template_key="y_combinator", priority=BATCH, user="api", profile=None):
+        """
+        Queue a deck for analysis and return its job id; model calls run at the
+        given scheduler priority. profile=True records a per-stage profile
+        (None defers to DECKIQ_PROFILE).
+        """
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            self.jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "analyses": list(analyses),
+                "priority": priority,
+                "progress": [],
+                "results": {},
+                "error": None,
+                "created": time.time(),
+            }
+            self._evict()
+        self.executor.submit(self._run, job_id, data, file_type, analyses, template_key, priority, user, profile)
+        return job_id
+
+    def get(self, job_id):
+        """Return a snapshot of the job, or None if unknown"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            return dict(job, progress=list(job["progress"]), results=dict(job["results"]))
+
+    def _update(self, job_id, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _progress(self, job_id):
+        def report(stage, message):
+            with self.lock:
+                job = self.jobs.get(job_id)
+                if job is not None:
+                    job["progress"].append({"stage": stage, "message": message, "at": time.time()})
+        return report
+
+    def _run(self, job_id, data, file_type, analyses, template_key, priority=BATCH, user="api", profile=None):
+        self._update(job_id, status="running")
+        report = self._progress(job_id)
+        with profile_run(f"job-{job_id[:12]}", enabled=profile) as session:
+            try:
+                report("extract", "Extracting deck text")
+                deck_text = extract_deck_text(data, file_type)
+                analyzer = self.analyzer_factory()
+                analyzer.helper.priority = priority
+                analyzer.helper.user = user
+                for analysis in analyses:
+                    with stage(f"analysis:{analysis}"):
+                        result = analyzer.run(analysis, deck_text, template_key, report)
+                    with self.lock:
+                        self.jobs[job_id]["results"][analysis] = result
+                self._update(job_id, status="done")
+            except Exception as e:
+                self._update(job_id, status="failed", error=str(e))
+        if session is not None:
+            self._update(job_id, profile={"stages": session.table(), "files": session.paths})
+
+    def _evict(self):
+        while len(self.jobs) > self.max_jobs:
+            for job_id, job in self.jobs.items():
+                if job["status"] in ("done", "failed"):
+                    del self.jobs[job_id]
+                    break
+            else:
+                return
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
@@ -0,0 +1,271 @@
+import asyncio
+import os
+import threading
+import time
+
+from utils.rate_limiter import RateLimiter
+from utils.retry_policy import RetryPolicy, AUTH, RATE_LIMIT
+
+
+ROUND_ROBIN = "round_robin"
+LEAST_LOADED = "least_loaded"
+
+
+def mask_key(api_key):
+    return f"…{api_key[-4:]}" if api_key and len(api_key) > 8 else "…"
+
+
+def keyed_model(model_name, api_key):
+    """
+    A GenerativeModel bound to its own API key and gRPC channel instead of
+    the process-global client that genai.configure() sets up.
+    """
+    import google.ai.generativelanguage as glm
+    import google.generativeai as genai
+
+    model = genai.GenerativeModel(model_name)
+    # The SDK has no per-model key option; the model uses these clients if set
+    model._client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+    model._async_client = glm.GenerativeServiceAsyncClient(client_options={"api_key": api_key})
+    return model
+
+
+class PooledClient:
+    """One API key's model with its own request quota and health state"""
+
+    def __init__(self, label, model, limiter):
+        self.label = label
+        self.model = model
+        self.limiter = limiter
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.disabled = False
+        self.cooldown_until = 0.0
+        self.last_error = None
+
+    def available(self, now):
+        return not self.disabled and self.cooldown_until <= now
+
+    def status(self, now):
+        if self.disabled:
+            state = "disabled"
+        elif self.cooldown_until > now:
+            state = f"cooling down ({self.cooldown_until - now:.0f}s)"
+        else:
+            state = "healthy"
+        return {
+            "key": self.label,
+            "state": state,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "last_error": str(self.last_error)[:200] if self.last_error else None,
+        }
+
+
+class PooledStream:
+    """
+    A streamed response that keeps its client checked out until the stream
+    has been read to the end, closed or has failed, so in-flight counts and
+    key health cover the whole generation. Everything else (text,
+    candidates, usage_metadata, ...) is read from the wrapped response.
+    """
+
+    def __init__(self, pool, client, response):
+        self.pool = pool
+        self.client = client
+        self.response = response
+        self.released = False
+
+    def _release(self, error=None):
+        if not self.released:
+            self.released = True
+            self.pool._finish(self.client, error)
+
+    def __iter__(self):
+        try:
+            yield from self.response
+        except Exception as e:
+            self._release(e)
+            raise
+        finally:
+            self._release()
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self.response:
+                yield chunk
+        except Exception as e:
+            self._release(e)
+            raise
+        finally:
+            self._release()
+
+    def resolve(self):
+        """Read the rest of the stream (like the SDK's resolve())"""
+        for _ in self:
+            pass
+
+    def close(self):
+        """Give the client back without reading the rest of the stream"""
+        self._release()
+
+    def __del__(self):
+        # Safety net for a stream that is dropped unread
+        if not self.__dict__.get("released", True):
+            self._release()
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__["response"], name)
+
+
+class ClientPool:
+    """
+    Spreads model calls over one model per API key. Quacks like a single
+    GenerativeModel, so GeminiHelper uses it unchanged.
+
+    Each key has its own client and token bucket (DECKIQ_REQUESTS_PER_MINUTE
+    per key), so throughput scales with the number of keys. Dispatch is
+    least-loaded (default) or round-robin (DECKIQ_POOL_STRATEGY). A key that
+    fails authentication leaves the rotation; a key that hits its quota
+    cools down for the server's retry hint, or `cooldown` seconds. Either
+    way the call fails over to another key before the error is surfaced.
+    """
+
+    # GeminiHelper skips the process-wide rate limiter for pooled models
+    throttles_requests = True
+
+    def __init__(self, models, model_name=None, strategy=None, cooldown=60.0,
+                 requests_per_minute=None, classifier=None):
+        self.clients = [
+            PooledClient(label, model, RateLimiter(requests_per_minute))
+            for label, model in models
+        ]
+        if not self.clients:
+            raise ValueError("ClientPool needs at least one model")
+        self.model_name = model_name
+        self.strategy = strategy or os.getenv("DECKIQ_POOL_STRATEGY", LEAST_LOADED)
+        self.cooldown = cooldown
+        self.classifier = classifier or RetryPolicy()
+        self.next_index = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_keys(cls, api_keys, model_name, **kwargs):
+        models = [(f"key-{i + 1} ({mask_key(key)})", keyed_model(model_name, key)) for i, key in enumerate(api_keys)]
+        return cls(models, model_name=model_name, **kwargs)
+
+    def _candidates(self, now):
+        """Healthy clients in dispatch order"""
+        with self.lock:
+            if self.strategy == ROUND_ROBIN:
+                start = self.next_index % len(self.clients)
+                self.next_index += 1
+                ordered = self.clients[start:] + self.clients[:start]
+            else:
+                ordered = sorted(self.clients, key=lambda c: (c.in_flight, c.calls))
+            return [c for c in ordered if c.available(now)]
+
+    def _begin(self, client):
+        with self.lock:
+            client.in_flight += 1
+            client.calls += 1
+        return client
+
+    def _finish(self, client, error=None):
+        """Release a client and update its health from the call outcome"""
+        category = self.classifier.classify(error) if error is not None else None
+        with self.lock:
+            client.in_flight -= 1
+            if error is None:
+                return
+            client.errors += 1
+            client.last_error = error
+            if category == AUTH:
+                client.disabled = True
+            elif category == RATE_LIMIT:
+                client.cooldown_until = time.monotonic() + (self.classifier.retry_hint(error) or self.cooldown)
+
+    def _wait_for_cooldown(self, deadline):
+        """No key is usable: sleep until the first cooldown ends, or re-raise why keys are out"""
+        with self.lock:
+            enabled = [c for c in self.clients if not c.disabled]
+            if not enabled:
+                raise self.clients[-1].last_error or PermissionError("All API keys were rejected")
+            soonest = min(enabled, key=lambda c: c.cooldown_until)
+        wait = soonest.cooldown_until - time.monotonic()
+        if time.monotonic() + wait > deadline:
+            raise soonest.last_error or TimeoutError("All API keys are cooling down")
+        time.sleep(max(0.0, wait))
+
+    def _checkout(self, timeout=None):
+        """Pick a healthy client with quota left, waiting up to timeout seconds"""
+        deadline = time.monotonic() + (timeout if timeout is not None else 60.0)
+        while True:
+            candidates = self._candidates(time.monotonic())
+            if not candidates:
+                self._wait_for_cooldown(deadline)
+                continue
+
+            for client in candidates:
+                if client.limiter.try_acquire():
+                    return self._begin(client)
+
+            # Every healthy key is out of tokens; wait briefly on the first, then re-plan
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Timed out waiting for an API key with quota left")
+            if candidates[0].limiter.acquire(min(remaining, 1.0)):
+                return self._begin(candidates[0])
+
+    def _should_fail_over(self, error, attempt):
+        """Auth and quota errors are per key: try another key if one is usable right now"""
+        if attempt >= len(self.clients):
+            return False
+        if self.classifier.classify(error) not in (AUTH, RATE_LIMIT):
+            return False
+        return bool(self._candidates(time.monotonic()))
+
+    def _finished(self, client, response, stream):
+        """A stream keeps its client until it has been read (see PooledStream); anything else releases it now"""
+        if stream:
+            return PooledStream(self, client, response)
+        self._finish(client)
+        return response
+
+    def generate_content(self, prompt, request_options=None, **kwargs):
+        timeout = (request_options or {}).get("timeout")
+        for attempt in range(1, len(self.clients) + 1):
+            client = self._checkout(timeout)
+            try:
+                response = client.model.generate_content(prompt, request_options=request_options, **kwargs)
+            except Exception as e:
+                self._finish(client, e)
+                if self._should_fail_over(e, attempt):
+                    continue
+                raise
+            return self._finished(client, response, kwargs.get("stream"))
+
+    async def generate_content_async(self, prompt, request_options=None, **kwargs):
+        timeout = (request_options or {}).get("timeout")
+        for attempt in range(1, len(self.clients) + 1):
+            client = await asyncio.to_thread(self._checkout, timeout)
+            try:
+                response = await client.model.generate_content_async(prompt, request_options=request_options, **kwargs)
+            except Exception as e:
+                self._finish(client, e)
+                if self._should_fail_over(e, attempt):
+                    continue
+                raise
+            return self._finished(client, response, kwargs.get("stream"))
+
+    def count_tokens(self, contents):
+        candidates = self._candidates(time.monotonic()) or self.clients
+        return candidates[0].model.count_tokens(contents)
+
+    def status(self):
+        """Per-key health, load and error counts"""
+        now = time.monotonic()
+        with self.lock:
+            return [client.status(now) for client in self.clients]
@@ -0,0 +1,224 @@
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import struct
+import threading
+import time
+import unicodedata
+
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Unicode words plus single symbols; of the symbols only currency signs are kept ("$5M" vs "€5M")
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# Fixed seed so signatures stay comparable across processes and restarts
+_rng = random.Random(1729)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+
+def normalize_words(text):
+    """
+    Case-folded Unicode word and currency-symbol tokens of NFKC-normalized
+    text; ignores layout and punctuation differences between PDF and PPTX exports
+    """
+    return [
+        token for token in _TOKEN_RE.findall(unicodedata.normalize("NFKC", text).casefold())
+        if token[0].isalnum() or token[0] == "_" or unicodedata.category(token[0]) == "Sc"
+    ]
+
+
+def deck_fingerprint(text):
+    """
+    Exact-content id for a deck: sha256 of its normalized words, or None
+    for a deck without any (nothing to tell it apart, so never cached)
+    """
+    words = normalize_words(text)
+    if not words:
+        return None
+    return hashlib.sha256(" ".join(words).encode("utf-8")).hexdigest()
+
+
+def _shingle_hashes(words):
+    if len(words) < SHINGLE_SIZE:
+        words = words + [""] * (SHINGLE_SIZE - len(words))
+    hashes = set()
+    for i in range(len(words) - SHINGLE_SIZE + 1):
+        shingle = " ".join(words[i:i + SHINGLE_SIZE]).encode("utf-8")
+        hashes.add(struct.unpack("<I", hashlib.blake2b(shingle, digest_size=4).digest())[0])
+    return hashes
+
+
+def minhash_signature(text):
+    """64-value MinHash signature over 5-word shingles"""
+    hashes = _shingle_hashes(normalize_words(text))
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def estimate_similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def _band_keys(signature):
+    keys = []
+    for band in range(BANDS):
+        chunk = struct.pack(f"<{ROWS}I", *signature[band * ROWS:(band + 1) * ROWS])
+        keys.append(struct.unpack("<q", hashlib.blake2b(chunk, digest_size=8).digest())[0])
+    return keys
+
+
+class DedupIndex:
+    """
+    Near-duplicate index over extracted deck text, stored in SQLite.
+
+    Decks are MinHash-signed and bucketed with LSH (16 bands x 4 rows), so a
+    lookup is 16 indexed point queries plus a signature comparison for the
+    few candidates - independent of how many decks are stored. Analysis
+    outputs are cached per deck so near-duplicates can reuse them.
+    """
+
+    def __init__(self, path=None, threshold=None):
+        self.path = path or os.getenv("DECKIQ_DEDUP_DB", os.path.join(".deckiq", "dedup.sqlite3"))
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("DECKIQ_DEDUP_THRESHOLD", "0.9")
+        )
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS decks (
+                deck_id TEXT PRIMARY KEY,
+                signature BLOB NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS bands (
+                band_key INTEGER NOT NULL,
+                deck_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_bands_key ON bands (band_key);
+            CREATE TABLE IF NOT EXISTS results (
+                deck_id TEXT NOT NULL,
+                result_key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (deck_id, result_key)
+            );
+        """)
+        self.conn.commit()
+
+    def _candidates(self, band_keys):
+        placeholders = ",".join("?" * len(band_keys))
+        rows = self.conn.execute(
+            f"SELECT DISTINCT d.deck_id, d.signature FROM bands b "
+            f"JOIN decks d ON d.deck_id = b.deck_id WHERE b.band_key IN ({placeholders})",
+            band_keys
+        ).fetchall()
+        return [(deck_id, struct.unpack(f"<{NUM_PERM}I", blob)) for deck_id, blob in rows]
+
+    def lookup(self, text, signature=None, exclude=None):
+        """Return (deck_id, similarity) of the closest indexed deck, or None"""
+        signature = signature or minhash_signature(text)
+        with self.lock:
+            candidates = self._candidates(_band_keys(signature))
+
+        best = None
+        for deck_id, candidate in candidates:
+            if deck_id == exclude:
+                continue
+            similarity = estimate_similarity(signature, candidate)
+            if best is None or similarity > best[1]:
+                best = (deck_id, similarity)
+        return best
+
+    def add(self, text, signature=None):
+        """Index a deck (idempotent) and return its deck id (None if it has no words)"""
+        deck_id = deck_fingerprint(text)
+        if deck_id is None:
+            return None
+        signature = signature or minhash_signature(text)
+        with self.lock:
+            exists = self.conn.execute(
+                "SELECT 1 FROM decks WHERE deck_id = ?", (deck_id,)
+            ).fetchone()
+            if not exists:
+                with self.conn:
+                    self.conn.execute(
+                        "INSERT INTO decks (deck_id, signature, created) VALUES (?, ?, ?)",
+                        (deck_id, struct.pack(f"<{NUM_PERM}I", *signature), time.time())
+                    )
+                    self.conn.executemany(
+                        "INSERT INTO bands (band_key, deck_id) VALUES (?, ?)",
+                        [(key, deck_id) for key in _band_keys(signature)]
+                    )
+        return deck_id
+
+    def register(self, text):
+        """
+        Look up the closest prior deck, then index this one.
+        Returns (deck_id, match) where match is (deck_id, similarity) or None.
+        """
+        deck_id = deck_fingerprint(text)
+        if deck_id is None:
+            return None, None
+        signature = minhash_signature(text)
+        match = self.lookup(text, signature, exclude=deck_id)
+        with self.lock:
+            seen = self.conn.execute(
+                "SELECT 1 FROM decks WHERE deck_id = ?", (deck_id,)
+            ).fetchone()
+        if seen:
+            match = (deck_id, 1.0)
+        else:
+            self.add(text, signature)
+        return deck_id, match
+
+    def get_result(self, deck_id, result_key):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM results WHERE deck_id = ? AND result_key = ?",
+                (deck_id, result_key)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_result(self, deck_id, result_key, value):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (deck_id, result_key, value, created) VALUES (?, ?, ?, ?)",
+                (deck_id, result_key, value, time.time())
+            )
+
+    def cached_result(self, deck_id, match, result_key):
+        """Cached output for this deck, or for a match above the similarity threshold"""
+        value = self.get_result(deck_id, result_key)
+        if value is None and match and match[1] >= self.threshold:
+            value = self.get_result(match[0], result_key)
+        return value
+
+    def get_or_compute(self, deck_id, match, result_key, compute):
+        """Return a cached output (see cached_result) or compute and store it; error strings are not cached"""
+        if deck_id is None:
+            return compute()
+        value = self.cached_result(deck_id, match, result_key)
+        if value is None:
+            value = compute()
+            if value and not value.startswith("Error"):
+                self.put_result(deck_id, result_key, value)
+        return value
@@ -0,0 +1,210 @@
+import hashlib
+import re
+from collections import OrderedDict, namedtuple
+
+from utils.profiling import profiled
+from utils.session_memory import SizedLRU, approximate_size
+
+
+# One extracted metric. value is normalized: currency amounts in units,
+# percentages as percent (25.0 for 25%), counts as plain numbers.
+Fact = namedtuple("Fact", ["metric", "value", "unit", "raw", "position"])
+
+METRIC_LABELS = {
+    'mrr': 'MRR',
+    'arr': 'ARR',
+    'revenue': 'Revenue',
+    'tam': 'TAM',
+    'sam': 'SAM',
+    'som': 'SOM',
+    'raise': 'Raise',
+    'valuation': 'Valuation',
+    'customers': 'Customers',
+    'users': 'Users',
+    'growth': 'Growth',
+    'gross_margin': 'Gross Margin',
+    'churn': 'Churn',
+    'retention': 'Retention',
+    'cac': 'CAC',
+    'ltv': 'LTV',
+}
+
+_SUFFIXES = {
+    'k': 1e3, 'thousand': 1e3,
+    'm': 1e6, 'mm': 1e6, 'mn': 1e6, 'million': 1e6,
+    'b': 1e9, 'bn': 1e9, 'billion': 1e9,
+    't': 1e12, 'tn': 1e12, 'trillion': 1e12,
+}
+
+_CURRENCIES = {'$': 'USD', 'usd': 'USD', '€': 'EUR', 'eur': 'EUR', '£': 'GBP', 'gbp': 'GBP', '₹': 'INR', 'inr': 'INR'}
+_CURRENCY_SYMBOLS = {'USD': '$', 'EUR': '€', 'GBP': '£', 'INR': '₹'}
+
+_NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+_SUFFIX = r"thousand|million|billion|trillion|mm|mn|bn|tn|k|m|b|t"
+
+# A single alternation scanned once over the deck: money, percentages and counted nouns
+_FACT_RE = re.compile(
+    rf"""
+    (?P<money>
+        (?:(?P<cur1>[$€£₹])\s?|(?P<cur2>usd|eur|gbp|inr)\s)
+        (?P<mnum>{_NUMBER})(?:\s?(?P<msuf>{_SUFFIX})\b)?
+    )
+    | (?P<pct>(?P<pnum>{_NUMBER})\s?%)
+    | (?P<count>
+        (?P<cnum>{_NUMBER})\s?(?P<csuf>k|m)?\+?\s+
+        (?:(?:paying|active|enterprise|monthly|daily|registered|b2b)\s+)?
+        (?P<noun>customers|clients|users|subscribers|merchants|businesses|companies|downloads)
+    )
+    """,
+    re.IGNORECASE | re.VERBOSE
+)
+
+# Keywords that attach a money amount or percentage to a metric, checked in context
+_MONEY_KEYWORDS = [
+    ('mrr', re.compile(r"\bmrr\b|monthly recurring")),
+    ('arr', re.compile(r"\barr\b|annual recurring|run[- ]rate")),
+    ('tam', re.compile(r"\btam\b|total addressable")),
+    ('sam', re.compile(r"\bsam\b|serviceable addressable|serviceable available")),
+    ('som', re.compile(r"\bsom\b|serviceable obtainable")),
+    ('valuation', re.compile(r"valuation|pre-money|post-money")),
+    ('raise', re.compile(r"raising|\braise\b|seeking|\bask\b|\bseed\b|series [a-d]|funding round|investment of")),
+    ('cac', re.compile(r"\bcac\b|acquisition cost")),
+    ('ltv', re.compile(r"\bltv\b|lifetime value")),
+    ('revenue', re.compile(r"revenue|sales|\bgmv\b")),
+    ('tam', re.compile(r"\bmarket\b")),
+]
+
+_PERCENT_KEYWORDS = [
+    ('gross_margin', re.compile(r"gross margin|\bmargin")),
+    ('churn', re.compile(r"churn")),
+    ('retention', re.compile(r"retention|\bnrr\b|\bndr\b")),
+    ('growth', re.compile(r"growth|growing|grew|\byoy\b|\bmom\b|\bcagr\b|increase")),
+]
+
+_CONTEXT_BEFORE = 60
+_CONTEXT_AFTER = 40
+_CLAUSE_BREAK_RE = re.compile(r"[\n;,|•]|\.\s")
+
+
+def _to_number(text):
+    return float(text.replace(",", ""))
+
+
+def _nearest_metric(text, start, end, keywords):
+    """
+    Pick the keyword closest to the match within its clause (bounded by
+    line breaks, commas, semicolons and sentence ends). Ties prefer the
+    label before the number, then earlier list entries.
+    """
+    before = text[max(0, start - _CONTEXT_BEFORE):start].lower()
+    after = text[end:end + _CONTEXT_AFTER].lower()
+    before = _CLAUSE_BREAK_RE.split(before)[-1]
+    after = _CLAUSE_BREAK_RE.split(after)[0]
+
+    best = None
+    for rank, (metric, pattern) in enumerate(keywords):
+        for found in pattern.finditer(before):
+            key = (len(before) - found.end(), 0, rank)
+            if best is None or key < best[0]:
+                best = (key, metric)
+        found = pattern.search(after)
+        if found:
+            key = (found.start(), 1, rank)
+            if best is None or key < best[0]:
+                best = (key, metric)
+    return best[1] if best else None
+
+
+class FactTable:
+    """Extracted facts for one deck, grouped by metric in document order"""
+
+    def __init__(self, facts):
+        self.facts = facts
+        self.by_metric = OrderedDict()
+        for fact in facts:
+            self.by_metric.setdefault(fact.metric, []).append(fact)
+
+    def __bool__(self):
+        return bool(self.facts)
+
+    def __contains__(self, metric):
+        return metric in self.by_metric
+
+    def get(self, metric):
+        """First mention of a metric, or None"""
+        values = self.by_metric.get(metric)
+        return values[0] if values else None
+
+    def metrics(self):
+        return list(self.by_metric.keys())
+
+    def as_rows(self):
+        """Flat rows for tables and storage"""
+        return [fact._asdict() for fact in self.facts]
+
+    def summary(self):
+        """Compact single-line rendering for prompts, e.g. 'MRR: $45K; TAM: $15B'"""
+        return "; ".join(
+            f"{METRIC_LABELS.get(metric, metric)}: {format_value(facts[0])}"
+            for metric, facts in self.by_metric.items()
+        )
+
+
+def format_value(fact):
+    """Human-readable normalized value"""
+    if fact.unit == '%':
+        return f"{fact.value:g}%"
+    value = fact.value
+    suffix = ""
+    for threshold, label in ((1e12, "T"), (1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if abs(value) >= threshold:
+            value, suffix = value / threshold, label
+            break
+    number = f"{value:.1f}".rstrip("0").rstrip(".") + suffix
+    if fact.unit == 'count':
+        return number
+    return f"{_CURRENCY_SYMBOLS.get(fact.unit, fact.unit + ' ')}{number}"
+
+
+@profiled("fact_extraction")
+def _extract(deck_text):
+    facts = []
+    for match in _FACT_RE.finditer(deck_text):
+        start, end = match.span()
+        if match.group('money'):
+            currency = _CURRENCIES[(match.group('cur1') or match.group('cur2')).lower()]
+            value = _to_number(match.group('mnum'))
+            suffix = (match.group('msuf') or "").lower()
+            value *= _SUFFIXES.get(suffix, 1)
+            metric = _nearest_metric(deck_text, start, end, _MONEY_KEYWORDS)
+            if metric:
+                facts.append(Fact(metric, value, currency, match.group(0).strip(), start))
+        elif match.group('pct'):
+            metric = _nearest_metric(deck_text, start, end, _PERCENT_KEYWORDS)
+            if metric:
+                facts.append(Fact(metric, _to_number(match.group('pnum')), '%', match.group(0), start))
+        else:
+            value = _to_number(match.group('cnum'))
+            value *= _SUFFIXES.get((match.group('csuf') or "").lower(), 1)
+            noun = match.group('noun').lower()
+            metric = 'users' if noun in ('users', 'subscribers', 'downloads') else 'customers'
+            facts.append(Fact(metric, value, 'count', match.group(0), start))
+    return FactTable(facts)
+
+
+_cache = SizedLRU("facts", max_entries=256)
+
+
+def extract_facts(deck_text):
+    """
+    Extract key metrics (MRR, TAM, customers, raise, ...) from deck text in a
+    single regex pass. Results are cached by the deck's sha256.
+    """
+    key = hashlib.sha256(deck_text.encode("utf-8")).hexdigest()
+    table = _cache.get(key)
+    if table is not None:
+        return table
+
+    table = _extract(deck_text)
+    _cache.put(key, table, approximate_size(table.facts))
+    return table
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import random
+import time
+from types import SimpleNamespace
+
+
+class FakeStreamResponse:
+    """
+    Streamed response shaped like the SDK's: iterating (sync or async)
+    yields chunks with .text, and once consumed it has the full text,
+    candidates and usage_metadata.
+    """
+
+    def __init__(self, response, delay, chunk_chars=200):
+        self.response = response
+        self.delay = delay
+        self.chunk_chars = chunk_chars
+
+    def _pieces(self):
+        text = self.response.text
+        return [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+
+    def __iter__(self):
+        pieces = self._pieces()
+        for piece in pieces:
+            time.sleep(self.delay / len(pieces))
+            yield SimpleNamespace(text=piece)
+
+    async def __aiter__(self):
+        pieces = self._pieces()
+        for piece in pieces:
+            await asyncio.sleep(self.delay / len(pieces))
+            yield SimpleNamespace(text=piece)
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__["response"], name)
+
+
+class FakeGenerativeModel:
+    """
+    Stand-in for genai.GenerativeModel used by load tests and local development.
+
+    Every call sleeps for latency +/- jitter seconds and returns a Markdown
+    document of roughly output_tokens tokens, shaped like a real response
+    (text, candidates[0].finish_reason, usage_metadata). stream=True returns
+    a FakeStreamResponse yielding the same text in chunks spread over the
+    latency.
+    """
+
+    def __init__(self, latency=1.0, jitter=0.2, output_tokens=600, error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.model_name = "fake-gemini"
+
+    @classmethod
+    def from_env(cls):
+        """Configure from DECKIQ_FAKE_GEMINI_LATENCY / _JITTER / _TOKENS / _ERROR_RATE"""
+        return cls(
+            latency=float(os.getenv("DECKIQ_FAKE_GEMINI_LATENCY", "1.0")),
+            jitter=float(os.getenv("DECKIQ_FAKE_GEMINI_JITTER", "0.2")),
+            output_tokens=int(os.getenv("DECKIQ_FAKE_GEMINI_TOKENS", "600")),
+            error_rate=float(os.getenv("DECKIQ_FAKE_GEMINI_ERROR_RATE", "0")),
+        )
+
+    def _delay(self):
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def _text(self, prompt, max_tokens):
+        tokens = min(self.output_tokens, max_tokens or self.output_tokens)
+        lines = ["## 📊 Simulated Analysis"]
+        section = 1
+        words = 0
+        while words * 4 // 3 < tokens:
+            if words % 120 == 0:
+                lines.append(f"\n### {section}. Section {section}")
+                section += 1
+            lines.append(f"- Simulated insight {words // 10 + 1} based on a {len(prompt)} character prompt")
+            words += 10
+        return "\n".join(lines)
+
+    def _response(self, prompt, text):
+        return SimpleNamespace(
+            text=text,
+            candidates=[SimpleNamespace(finish_reason=SimpleNamespace(name="STOP"))],
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=len(str(prompt)) // 4,
+                candidates_token_count=len(text) // 4,
+            ),
+        )
+
+    def _maybe_fail(self):
+        if self.error_rate and random.random() < self.error_rate:
+            raise ConnectionError("Simulated transient failure")
+
+    def generate_content(self, prompt, generation_config=None, request_options=None, stream=False, **kwargs):
+        max_tokens = getattr(generation_config, "max_output_tokens", None)
+        text = self._text(str(prompt), max_tokens)
+        delay = self._delay()
+        if stream:
+            return self._stream(prompt, text, delay)
+        time.sleep(delay)
+        self._maybe_fail()
+        return self._response(prompt, text)
+
+    def _stream(self, prompt, text, delay):
+        self._maybe_fail()
+        return FakeStreamResponse(self._response(prompt, text), delay)
+
+    async def generate_content_async(self, prompt, generation_config=None, request_options=None, stream=False,
+                                     **kwargs):
+        max_tokens = getattr(generation_config, "max_output_tokens", None)
+        text = self._text(str(prompt), max_tokens)
+        if stream:
+            return self._stream(prompt, text, self._delay())
+        await asyncio.sleep(self._delay())
+        self._maybe_fail()
+        return self._response(prompt, text)
+
+    def count_tokens(self, contents):
+        return SimpleNamespace(total_tokens=len(str(contents)) // 4)
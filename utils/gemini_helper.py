@@ -1,416 +1,374 @@
-import google.generativeai as genai
-import streamlit as st
+import hashlib
+import os
 import time
-import random
+
+from utils.fact_extractor import extract_facts
+from utils.generation_profiles import get_generation_profiles
+from utils.map_reduce import condense_deck, ProgressRelay
+from utils.profiling import stage
+from utils.prompt_registry import get_prompt_registry, estimate_tokens
+from utils.quota import get_token_ledger, seconds_until_reset, QuotaExceeded, BUDGET_ERROR
+from utils.rate_limiter import get_rate_limiter
+from utils.retry_policy import RetryPolicy, RetryError, RATE_LIMIT, TRANSIENT, AUTH, NOT_FOUND, INVALID, UNKNOWN
+from utils.scheduler import get_scheduler, INTERACTIVE, Preempted
+from utils.slide_renderer import IMAGE_TOKENS
+
 
 class GeminiHelper:
-    def __init__(self, model, model_name):
+    def __init__(self, model=None, model_name=None, retry_policy=None, model_loader=None,
+                 on_progress=None, profiles=None, rate_limiter=None, map_reduce_chars=30000,
+                 prompts=None, scheduler=None, priority=INTERACTIVE, user="default", ledger=None,
+                 preflight=None):
         self.model = model
         self.model_name = model_name
-        self.max_retries = 3
-        self.base_delay = 1
+        self.model_loader = model_loader
+        # on_progress(stage, message) keeps this class free of any UI dependency
+        self.on_progress = on_progress
+        self._relay = None
+        self.profiles = profiles or get_generation_profiles()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.prompts = prompts or get_prompt_registry()
+        # Model calls are admitted through the fair-share scheduler as (priority, user)
+        self.scheduler = scheduler or get_scheduler()
+        self.priority = priority
+        self.user = user
+        # Per-user daily token budgets, checked before any network call
+        self.ledger = ledger or get_token_ledger()
+        # Pre-flight prompt sizing: "local" estimate or the API's count_tokens ("api")
+        self.preflight = preflight or os.getenv("DECKIQ_PREFLIGHT_COUNT", "local")
+        # Decks longer than this are condensed chunk-by-chunk instead of truncated
+        self.map_reduce_chars = map_reduce_chars
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_attempts=3,
+            base_delay=1.0,
+            deadline=90.0,
+            on_retry=self._notify_retry
+        )
+
+    def _report(self, stage, message):
+        if self.on_progress:
+            # During map-reduce, reports from worker threads go through the relay
+            (self._relay or self.on_progress)(stage, message)
+
+    def _notify_retry(self, category, attempt, delay, error):
+        """Report retry progress through on_progress"""
+        if isinstance(error, Preempted):
+            self._report("retry", f"Service busy. Retrying in {delay:.1f}s... (Attempt {attempt + 1}/{self.retry_policy.max_attempts})")
+        elif category == RATE_LIMIT:
+            self._report("retry", f"Rate limit reached. Waiting {delay:.1f} seconds before retry...")
+        elif category == TRANSIENT:
+            self._report("retry", f"Network issue. Retrying in {delay:.1f}s... (Attempt {attempt + 1}/{self.retry_policy.max_attempts})")
+        else:
+            self._report("retry", f"Unexpected error. Retrying in {delay:.1f}s... (Attempt {attempt + 1}/{self.retry_policy.max_attempts})")
+
+    def _ensure_model(self):
+        """Resolve the model through model_loader on first use"""
+        if self.model is None and self.model_loader is not None:
+            self.model, self.model_name = self.model_loader()
+        return self.model
+
+    def _acquire_slot(self, timeout):
+        """Wait for the process-wide rate limiter unless the model throttles per key (ClientPool)"""
+        if getattr(self.model, "throttles_requests", False):
+            return True
+        return self.rate_limiter.acquire(timeout)
+
+    def _generation_config(self, analysis):
+        import google.generativeai as genai
+
+        profile = self.profiles.get(analysis, self.model_name)
+        return genai.types.GenerationConfig(
+            temperature=profile['temperature'],
+            max_output_tokens=profile['max_output_tokens'],
+            stop_sequences=profile['stop_sequences'] or None,
+            top_p=0.8,
+            top_k=40
+        )
+
+    def _record_output_length(self, analysis, response):
+        """Feed the output length back into the generation profile stats"""
+        if analysis is None:
+            return
+        usage = getattr(response, "usage_metadata", None)
+        output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+        if not output_tokens:
+            try:
+                output_tokens = len(response.text) // 4
+            except (AttributeError, ValueError):
+                pass  # No text: still recorded, so an empty MAX_TOKENS response raises the cap
+        # Thoughts are billed against max_output_tokens too
+        output_tokens += getattr(usage, "thoughts_token_count", 0) or 0
+        truncated = self._finish_reason(response) == "MAX_TOKENS"
+        self.profiles.record(analysis, output_tokens, truncated, self.model_name)
+
+    def _error_message(self, error):
+        """Translate a RetryError into the user-facing error string"""
+        if error.category == RATE_LIMIT:
+            return "Error: API quota exceeded. Please try again later or check your API limits."
+        if error.category == NOT_FOUND:
+            return f"Error: Model {self.model_name} not available. Please check your API configuration."
+        if error.category == AUTH:
+            return "Error: Invalid API key. Please check your Google Gemini API key."
+        if error.category == INVALID:
+            return f"Error: Request rejected by the API ({error.last_exception}). Please try again."
+        if error.category == TRANSIENT:
+            return "Error: Network connection failed. Please check your internet connection."
+        return f"Error: {error.last_exception}. Please try again or contact support."
+
+    def _prompt_tokens(self, contents, text_tokens=None):
+        """
+        Prompt tokens for the assembled contents (text plus any inline images).
+        text_tokens is a precomputed estimate of the text part, e.g. a
+        template's static tokens plus its field values.
+        """
+        if self.preflight == "api":
+            try:
+                return self.model.count_tokens(contents).total_tokens
+            except Exception:
+                pass  # Fall back to the local estimate rather than fail the request
+        text = contents if isinstance(contents, str) else contents[0]
+        images = 0 if isinstance(contents, str) else len(contents) - 1
+        if text_tokens is None:
+            text_tokens = estimate_tokens(text)
+        return text_tokens + IMAGE_TOKENS * images
+
+    def _reserve(self, contents, analysis, text_tokens=None):
+        """
+        Admit a request against the user's daily budget before it touches the
+        network; returns (reservation, prompt tokens)
+        """
+        prompt_tokens = self._prompt_tokens(contents, text_tokens)
+        cost = prompt_tokens + self.profiles.get(analysis, self.model_name)['max_output_tokens']
+        return self.ledger.reserve(self.user, cost), prompt_tokens
 
-    def _generate_with_retry(self, prompt, max_length=30000):
-        """Generate content with retry logic and error handling"""
-        for attempt in range(self.max_retries):
+    def _failed_attempt_tokens(self, error, prompt_tokens):
+        """
+        Prompt tokens to charge for an attempt that reached the model and
+        failed: timeouts, server errors and interrupted streams may have been
+        processed and billed; rejections (quota, auth, invalid) are not.
+        """
+        if self.retry_policy.classify(error) in (TRANSIENT, UNKNOWN):
+            return prompt_tokens
+        return 0
+
+    def _billed_tokens(self, response):
+        """Tokens a finished call actually used, from usage metadata when available"""
+        if response is None:
+            return 0
+        usage = getattr(response, "usage_metadata", None)
+        total = getattr(usage, "total_token_count", 0)
+        if not total:
+            total = getattr(usage, "prompt_token_count", 0) + getattr(usage, "candidates_token_count", 0)
+        if not total:
             try:
-                # Truncate content if too long
-                if len(prompt) > max_length:
-                    prompt = prompt[:max_length] + "\n\n[Content truncated due to length]"
-
-                response = self.model.generate_content(
-                    prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.7,
-                        max_output_tokens=4000,
-                        top_p=0.8,
-                        top_k=40
+                total = estimate_tokens(response.text)
+            except ValueError:
+                total = 0
+        return total
+
+    def _quota_message(self, error):
+        hours, seconds = divmod(seconds_until_reset(), 3600)
+        return (
+            f"{BUDGET_ERROR} ({error.remaining:,} of {error.budget:,} tokens left, "
+            f"this request needs ~{error.needed:,}). The budget resets in {hours}h {seconds // 60}m."
+        )
+
+    def _finish_reason(self, response):
+        try:
+            reason = response.candidates[0].finish_reason
+        except (AttributeError, IndexError):
+            return "UNKNOWN"
+        return getattr(reason, "name", str(reason))
+
+    def _response_text(self, response):
+        """The response text, or an error string when it has none (safety block, MAX_TOKENS, empty)"""
+        try:
+            text = response.text
+        except ValueError:
+            text = ""
+        if text:
+            return text
+        return f"Error: No response generated (finish reason: {self._finish_reason(response)}). Please try again."
+
+    def _truncate(self, prompt, max_length):
+        if len(prompt) > max_length:
+            prompt = prompt[:max_length] + "\n\n[Content truncated due to length]"
+        return prompt
+
+    def _contents(self, prompt, images):
+        """Text prompt followed by inline JPEG parts for any slide images"""
+        if not images:
+            return prompt
+        return [prompt] + [{"mime_type": "image/jpeg", "data": image} for _, image in images]
+
+    def _consume_stream(self, response, on_stream):
+        """Read a streamed response to the end, passing on_stream the text so far after each chunk"""
+        text = ""
+        for chunk in response:
+            try:
+                piece = chunk.text
+            except ValueError:
+                continue  # A chunk without text parts (e.g. only safety ratings)
+            if piece:
+                text += piece
+                on_stream(text)
+        return response
+
+    def _generate_with_retry(self, prompt, analysis=None, max_length=30000, images=None, on_stream=None,
+                             text_tokens=None):
+        """
+        Generate content with retry logic and error handling. With on_stream
+        the response is streamed and on_stream(text_so_far) is called as it
+        arrives; a retried attempt starts over from the first chunk.
+        text_tokens is an optional precomputed estimate for the pre-flight.
+        """
+        if self._ensure_model() is None:
+            return "Error: Gemini model is not available. Please check your API key."
+        prompt = self._contents(self._truncate(prompt, max_length), images)
+        try:
+            reservation, prompt_tokens = self._reserve(prompt, analysis, text_tokens)
+        except QuotaExceeded as e:
+            return self._quota_message(e)
+        # Prompt tokens of failed attempts that reached the model
+        charged = 0
+
+        def attempt(timeout):
+            nonlocal charged
+            deadline = time.monotonic() + timeout
+            with self.scheduler.admit(self.priority, self.user, timeout):
+                if not self._acquire_slot(max(0.0, deadline - time.monotonic())):
+                    raise TimeoutError("Timed out waiting for a rate limiter slot")
+                options = {"stream": True} if on_stream else {}
+                try:
+                    response = self.model.generate_content(
+                        prompt,
+                        generation_config=self._generation_config(analysis),
+                        request_options={"timeout": max(1.0, deadline - time.monotonic())},
+                        **options
                     )
+                    # Streams are read inside the admission so the slot covers the whole generation
+                    return self._consume_stream(response, on_stream) if on_stream else response
+                except BaseException as e:
+                    charged += self._failed_attempt_tokens(e, prompt_tokens)
+                    raise
+
+        response = None
+        try:
+            response = self.retry_policy.call(attempt)
+        except RetryError as e:
+            return self._error_message(e)
+        finally:
+            self.ledger.settle(reservation, self._billed_tokens(response) + charged)
+
+        self._record_output_length(analysis, response)
+        return self._response_text(response)
+
+    def _prepare_deck_text(self, deck_text, room=None):
+        """
+        Build the deck portion of a prompt: locally extracted key metrics as a
+        compact header, followed by the deck text. Long documents go through
+        map-reduce: each chunk of pages is condensed into notes in parallel
+        (cached per chunk) and the notes replace the raw text, so the whole
+        document is covered instead of truncated. room is the space the
+        prompt leaves for this part; a deck that doesn't fit is condensed.
+        """
+        facts = extract_facts(deck_text)
+        header = f"**KEY METRICS (pre-extracted from the deck):** {facts.summary()}\n\n" if facts else ""
+
+        limit = self.map_reduce_chars if room is None else min(self.map_reduce_chars, room)
+        if len(header) + len(deck_text) <= limit or self._ensure_model() is None:
+            return header + deck_text
+
+        self._report("map", "Long document detected. Condensing sections in parallel...")
+        # Chunk calls run on worker threads; their reports reach on_progress on this one
+        self._relay = ProgressRelay(self.on_progress) if self.on_progress else None
+        try:
+            with stage("map_reduce"):
+                notes = condense_deck(
+                    deck_text,
+                    lambda prompt: self._generate_with_retry(prompt, "chunk_notes"),
+                    self.prompts.get("chunk_notes"),
+                    on_progress=self._relay
                 )
+        finally:
+            self._relay = None
+        self._report("reduce", "Combining condensed notes")
+        return f"{header}[Condensed section notes from a long document, in page order]\n\n{notes}"
 
-                if response.text:
-                    return response.text
-                else:
-                    return "Error: No response generated. Please try again."
-
-            except Exception as e:
-                error_msg = str(e).lower()
-
-                # Handle specific error types
-                if "quota" in error_msg or "rate limit" in error_msg:
-                    if attempt < self.max_retries - 1:
-                        wait_time = self.base_delay * (2 ** attempt) + random.uniform(0, 1)
-                        st.warning(f"Rate limit reached. Waiting {wait_time:.1f} seconds before retry...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        return "Error: API quota exceeded. Please try again later or check your API limits."
-
-                elif "404" in error_msg or "not found" in error_msg:
-                    return f"Error: Model {self.model_name} not available. Please check your API configuration."
-
-                elif "authentication" in error_msg or "invalid" in error_msg:
-                    return "Error: Invalid API key. Please check your Google Gemini API key."
-
-                elif "network" in error_msg or "connection" in error_msg:
-                    if attempt < self.max_retries - 1:
-                        st.warning(f"Network issue. Retrying... (Attempt {attempt + 2}/{self.max_retries})")
-                        time.sleep(2)
-                        continue
-                    else:
-                        return "Error: Network connection failed. Please check your internet connection."
-
-                else:
-                    if attempt < self.max_retries - 1:
-                        st.warning(f"Unexpected error. Retrying... (Attempt {attempt + 2}/{self.max_retries})")
-                        time.sleep(1)
-                        continue
-                    else:
-                        return f"Error: {str(e)}. Please try again or contact support."
-
-        return "Error: Failed after multiple attempts. Please try again later."
-
-    def generate_structure(self, deck_text):
-        """Generate structured outline with enhanced prompting"""
-        prompt = f"""
-        You are an expert startup advisor. Analyze this pitch deck content and create a professional, investor-ready structured outline.
-
-        **INSTRUCTIONS:**
-        - Reorganize the content into clear sections that follow investor expectations
-        - Use the actual information provided, don't make up details
-        - If information is missing for a section, indicate "Not specified in current deck"
-        - Be specific and actionable in your recommendations
-        - Format using markdown headers and bullet points
-
-        **REQUIRED STRUCTURE:**
-
-        ## 📊 RESTRUCTURED PITCH DECK
-
-        ### 1. 🎯 PROBLEM
-        - What specific pain point are you solving?
-        - Who experiences this problem?
-        - How urgent/expensive is this problem?
-
-        ### 2. 💡 SOLUTION
-        - Your unique approach to solving the problem
-        - Key features/capabilities
-        - Why your solution is different/better
-
-        ### 3. 🌍 MARKET OPPORTUNITY
-        - Total Addressable Market (TAM)
-        - Target customer segments
-        - Market trends supporting your solution
-
-        ### 4. 📈 TRACTION & VALIDATION
-        - Key metrics and milestones achieved
-        - Customer testimonials/case studies
-        - Revenue/user growth data
-
-        ### 5. 💰 BUSINESS MODEL
-        - How you make money
-        - Pricing strategy
-        - Revenue streams
-
-        ### 6. ⚔️ COMPETITIVE ADVANTAGE
-        - Key competitors and how you're different
-        - Your unfair advantages
-        - Barriers to entry you've built
-
-        ### 7. 👥 TEAM
-        - Founder backgrounds and expertise
-        - Key team members and advisors
-        - Why this team can execute
-
-        ### 8. 📊 FINANCIAL PROJECTIONS
-        - Revenue projections (3-5 years)
-        - Key financial metrics
-        - Path to profitability
-
-        ### 9. 💸 FUNDING ASK
-        - How much you're raising
-        - Use of funds breakdown
-        - Expected milestones with this funding
-
-        **PITCH DECK CONTENT:**
-        {deck_text}
-
-        **OUTPUT FORMAT:**
-        - Use clear, professional language
-        - Include specific numbers/metrics where mentioned
-        - Make it investor-focused and compelling
-        - Use bullet points for readability
-        """
+    def _select_prompt(self, analysis, deck_text):
+        """A/B variant for this deck; stable per deck so cached outputs stay valid"""
+        return self.prompts.select(analysis, hashlib.sha256(deck_text.encode("utf-8")).hexdigest())
 
-        return self._generate_with_retry(prompt)
+    def prompt_key(self, analysis, deck_text, image_budget=None):
+        """
+        Cache key for an analysis output, versioned by the prompt template used.
+        image_budget marks outputs generated with slide thumbnails attached.
+        """
+        key = self._select_prompt(analysis, deck_text).key
+        if image_budget:
+            key += f"+{self.prompts.get('slide_images').key}:{image_budget}"
+        return key
+
+    def _run_prompt(self, analysis, deck_text, images=None, on_stream=None, **fields):
+        """Render the registered prompt for an analysis, generate, and record variant stats"""
+        template = self._select_prompt(analysis, deck_text)
+        max_length = 30000
+        # Whatever the template text and other fields leave is the deck's share
+        room = max_length - len(template.static_text) - sum(
+            len(str(fields[field])) for field in template.fields if field != "deck_text"
+        )
+        deck_part = self._prepare_deck_text(deck_text, room)
+        with stage("prompt_build"):
+            values = dict(fields, deck_text=deck_part)
+            prompt = template.render(**values)
+            # The template's static tokens were counted when it was compiled; only the values are sized here
+            text_tokens = template.estimate_tokens(**values)
+            if images:
+                note = self.prompts.get("slide_images")
+                note_values = {"count": len(images), "pages": ", ".join(str(number + 1) for number, _ in images)}
+                # Truncate before appending so the image note always survives
+                prompt = self._truncate(prompt, max_length) + "\n" + note.render(**note_values)
+                text_tokens += note.estimate_tokens(**note_values) + 1
+                max_length = len(prompt)
+
+        started = time.perf_counter()
+        with stage("model_call"):
+            output = self._generate_with_retry(
+                prompt, analysis, max_length, images=images, on_stream=on_stream, text_tokens=text_tokens
+            )
+        self.prompts.record(
+            template,
+            time.perf_counter() - started,
+            text_tokens + IMAGE_TOKENS * len(images or []),
+            estimate_tokens(output),
+            ok=not output.startswith("Error")
+        )
+        return output
+
+    def generate_structure(self, deck_text, on_stream=None):
+        """Generate structured outline with enhanced prompting; on_stream receives the text as it streams"""
+        return self._run_prompt("structure", deck_text, on_stream=on_stream)
 
     def generate_pitch_script(self, deck_text):
         """Generate compelling pitch script"""
-        prompt = f"""
-        Create a compelling 2-minute founder pitch script based on this deck content. You are an expert pitch coach helping a startup founder.
-
-        **SCRIPT REQUIREMENTS:**
-
-        **Structure & Timing:**
-        - **Hook (0-15 sec)**: Grab attention with compelling opening
-        - **Problem (15-30 sec)**: Paint the pain point vividly
-        - **Solution (30-60 sec)**: Your unique approach and key benefits
-        - **Traction (60-90 sec)**: Proof points and momentum
-        - **Ask (90-120 sec)**: Clear funding request and vision
-
-        **Writing Style:**
-        - Conversational and confident tone
-        - Include specific metrics and numbers from the deck
-        - Use storytelling elements
-        - End with memorable call-to-action
-        - Add timing and emphasis cues
-
-        **FORMAT:**
-
-        # 🎤 YOUR 2-MINUTE PITCH SCRIPT
-
-        ## Opening Hook (0-15 seconds)
-        [Your compelling opening that grabs attention...]
-
-        ## Problem Statement (15-30 seconds)
-        [Paint the problem vividly with real impact...]
+        return self._run_prompt("pitch_script", deck_text)
 
-        ## Solution Demo (30-60 seconds)
-        [Show your solution and key differentiators...]
-
-        ## Traction Proof (60-90 seconds)
-        [Share your momentum and validation...]
-
-        ## The Ask (90-120 seconds)
-        [Clear funding request and exciting vision...]
-
-        ---
-        **💡 Delivery Tips:**
-        - Maintain eye contact with investors
-        - Use confident body language
-        - Practice timing with a stopwatch
-        - End with enthusiasm and clear next steps
-
-        **DECK CONTENT:**
-        {deck_text}
-
-        Remember: Use only the information provided in the deck content. If key information is missing, note it as "[Add specific detail about X]" in the script.
+    def generate_design_suggestions(self, deck_text, slide_images=None):
         """
-
-        return self._generate_with_retry(prompt)
-
-    def generate_design_suggestions(self, deck_text):
-        """Generate modern design recommendations"""
-        prompt = f"""
-        You are a professional presentation designer. Provide specific, actionable slide design recommendations for this pitch deck based on current 2024-2025 investor presentation best practices.
-
-        **ANALYSIS REQUIRED:**
-
-        ## 🎨 DESIGN ANALYSIS & RECOMMENDATIONS
-
-        ### 1. 📐 VISUAL HIERARCHY & TYPOGRAPHY
-        **Font Recommendations:**
-        - Header fonts: [Specific font suggestions]
-        - Body text fonts: [Readable options]
-        - Font sizes for different slide types
-
-        **Layout Principles:**
-        - Slide composition guidelines
-        - White space usage
-        - Visual flow improvements
-
-        ### 2. 🎨 COLOR PALETTE & BRANDING
-        **Professional Color Schemes:**
-        - Primary brand colors (2-3 max)
-        - Supporting colors for charts/data
-        - High contrast for readability
-
-        **Industry Standards:**
-        - Colors that work in investor presentations
-        - Accessibility considerations
-        - Print-friendly options
-
-        ### 3. 📊 DATA VISUALIZATION
-        **Chart Improvements:**
-        - Best chart types for different data
-        - Color coding strategies
-        - Making numbers more impactful
-
-        **Visual Metaphors:**
-        - Icons and illustrations
-        - Infographic opportunities
-
-        ### 4. 🖼️ IMAGERY & GRAPHICS
-        **Professional Standards:**
-        - High-quality imagery guidelines
-        - Avoiding cliché stock photos
-        - Brand-consistent visual style
-
-        ### 5. 📱 MODERN TRENDS (2024-2025)
-        **Current Best Practices:**
-        - Minimalist vs detailed approaches
-        - Interactive elements for digital presentation
-        - Mobile-friendly considerations
-
-        ### 6. 🎯 SLIDE-SPECIFIC RECOMMENDATIONS
-        Based on the content provided, give specific suggestions for:
-        - Title/cover slides
-        - Problem/solution slides
-        - Market size visualization
-        - Traction/metrics slides
-        - Team introduction slides
-        - Financial projection slides
-
-        **DECK CONTENT:**
-        {deck_text}
-
-        **OUTPUT REQUIREMENTS:**
-        - Provide specific, actionable recommendations
-        - Include rationale for each suggestion
-        - Focus on investor presentation standards
-        - Consider both digital and print formats
+        Generate modern design recommendations. slide_images, a list of
+        (page_number, jpeg_bytes) thumbnails, switches to multimodal mode.
         """
-
-        return self._generate_with_retry(prompt)
+        return self._run_prompt("design", deck_text, images=slide_images)
 
     def generate_benchmark_analysis(self, deck_text, missing_elements, template_name):
         """Generate comprehensive benchmark analysis"""
-        prompt = f"""
-        You are a seasoned venture capital advisor. Conduct a comprehensive benchmark analysis of this pitch deck against {template_name} investment standards.
-
-        **ANALYSIS FRAMEWORK:**
-
-        ## 📊 BENCHMARK ANALYSIS REPORT
-
-        **Template Standard:** {template_name}
-        **Missing Critical Elements:** {', '.join(missing_elements) if missing_elements else 'None identified - Excellent coverage!'}
-
-        ### 1. ✅ STRENGTHS ANALYSIS
-        **What's Working Well:**
-        - Content areas that meet/exceed VC standards
-        - Compelling messaging and positioning
-        - Strong data points and metrics
-
-        ### 2. ⚠️ IMPROVEMENT OPPORTUNITIES
-        **Content Gaps:**
-        - Missing critical information for investors
-        - Weak or unclear sections that need strengthening
-        - Opportunities for more compelling messaging
-
-        **Structural Issues:**
-        - Flow and organization improvements
-        - Information hierarchy fixes
-        - Slide sequence optimization
-
-        ### 3. 🎯 CRITICAL MISSING ELEMENTS
-        For each missing element, provide:
-        - Why it's essential for {template_name} standard
-        - What specific information should be included
-        - Where it should be positioned in the deck
-        - Impact on investor decision-making
-
-        ### 4. 📈 CONTENT DEPTH ASSESSMENT
-        **Information Sufficiency:**
-        - Are key points adequately detailed?
-        - What additional data/metrics would strengthen the case?
-        - Balance between detail and clarity
-
-        ### 5. 💰 INVESTOR APPEAL EVALUATION
-        **Compelling Narrative:**
-        - Story strength and emotional appeal
-        - Logical flow and persuasiveness
-        - Memorable differentiators and hooks
-
-        **Risk Assessment:**
-        - How well potential risks are addressed
-        - Credibility factors present
-        - Trust-building elements
-
-        ### 6. 🚀 PRIORITY ACTION ITEMS
-        **High-Impact Quick Fixes:**
-        1. [Most critical improvements needed]
-        2. [Content additions with biggest ROI]
-        3. [Structural changes for better flow]
-
-        **Strategic Enhancements:**
-        - Advanced positioning strategies
-        - Competitive differentiation opportunities
-        - Investor-specific customization
-
-        ### 7. 📊 SCORING vs {template_name} STANDARD
-        **Overall Assessment:**
-        - Investment readiness score (1-10 with explanation)
-        - Category-specific ratings
-        - Comparison to successful decks in this template
-
-        **DECK CONTENT TO ANALYZE:**
-        {deck_text}
-
-        **REQUIREMENTS:**
-        - Be specific and actionable in all recommendations
-        - Use actual content from the deck (don't invent details)
-        - Focus on {template_name} specific requirements
-        - Provide clear rationale for each suggestion
-        - Prioritize recommendations by impact and effort
-        """
-
-        return self._generate_with_retry(prompt)
-
-    def generate_one_pager(self, deck_text):
-        """Generate executive summary one-pager"""
-        prompt = f"""
-        Create a concise, professional one-page executive summary from this pitch deck content. You are creating this for busy investors who need key information at a glance.
-
-        **EXECUTIVE SUMMARY FORMAT:**
-
-        # [COMPANY NAME]
-        **One-Line Pitch:** *[Compelling tagline describing what you do]*
-
-        ## 🎯 THE OPPORTUNITY
-        **Problem:** [Brief description of the pain point]
-        **Market Size:** [TAM/SAM figures if available]
-        **Timing:** [Why now is the right time]
-
-        ## 💡 OUR SOLUTION
-        **Product:** [What you've built and core functionality]
-        **Key Differentiator:** [What makes you uniquely positioned]
-        **Value Proposition:** [Primary benefits to customers]
-
-        ## 📈 TRACTION & VALIDATION
-        **Metrics:** [Key performance indicators and growth]
-        **Customers:** [Notable clients, user base, or pilot programs]
-        **Revenue:** [Financial performance highlights]
-
-        ## 💰 BUSINESS MODEL
-        **Revenue Streams:** [How you generate money]
-        **Unit Economics:** [Key financial metrics like CAC, LTV]
-        **Scalability:** [Growth potential and expansion opportunities]
-
-        ## 👥 FOUNDING TEAM
-        **Leadership:** [Brief backgrounds of key founders]
-        **Expertise:** [Relevant experience and track record]
-        **Advisors:** [Notable advisors or board members if mentioned]
-
-        ## 💸 INVESTMENT OPPORTUNITY
-        **Raising:** [Amount seeking to raise]
-        **Use of Capital:** [Primary allocation of funds]
-        **Key Milestones:** [What you'll achieve with this funding]
-        **Next Round:** [Timeline and expected progress]
-
-        ---
-        **Contact:** [Founder name] • [Email if provided]
-
-        **REQUIREMENTS:**
-        - Maximum 400 words total
-        - Use bullet points and clear formatting
-        - Include specific numbers and metrics from the deck
-        - Professional but engaging tone
-        - Scannable for busy investors
-        - Only use information actually provided in the deck
-
-        **DECK CONTENT:**
-        {deck_text}
-
-        **NOTE:** If critical information is missing from the deck, indicate with [To be added] rather than inventing details.
-        """
-
-        return self._generate_with_retry(prompt)
+        return self._run_prompt(
+            "benchmark",
+            deck_text,
+            template_name=template_name,
+            missing_elements=', '.join(missing_elements) if missing_elements else 'None identified - Excellent coverage!'
+        )
+
+    def generate_one_pager(self, deck_text, on_stream=None):
+        """Generate executive summary one-pager; on_stream receives the text as it streams"""
+        return self._run_prompt("one_pager", deck_text, on_stream=on_stream)
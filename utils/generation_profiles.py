@@ -0,0 +1,203 @@
+import atexit
+import json
+import math
+import os
+import threading
+import time
+
+
+# Baseline generation settings per analysis type. max_output_tokens is the cap
+# used until enough output lengths have been recorded to tune it.
+DEFAULT_PROFILES = {
+    'structure': {
+        'max_output_tokens': 3000,
+        'temperature': 0.6,
+        'stop_sequences': []
+    },
+    'pitch_script': {
+        # ~300 spoken words for two minutes plus headings and delivery tips
+        'max_output_tokens': 1200,
+        'temperature': 0.8,
+        'stop_sequences': []
+    },
+    'design': {
+        'max_output_tokens': 3000,
+        'temperature': 0.7,
+        'stop_sequences': []
+    },
+    'benchmark': {
+        'max_output_tokens': 4000,
+        'temperature': 0.5,
+        'stop_sequences': []
+    },
+    'one_pager': {
+        # Prompt caps the summary at 400 words
+        'max_output_tokens': 900,
+        'temperature': 0.5,
+        'stop_sequences': []
+    },
+    'chunk_notes': {
+        # Map step of long-document analysis: ~200 words of notes per chunk
+        'max_output_tokens': 400,
+        'temperature': 0.2,
+        'stop_sequences': []
+    },
+}
+
+FALLBACK_PROFILE = {'max_output_tokens': 4000, 'temperature': 0.7, 'stop_sequences': []}
+
+MIN_OUTPUT_TOKENS = 256
+MAX_OUTPUT_TOKENS = 8192
+
+# Thinking models (Gemini 2.5) spend part of max_output_tokens on thoughts
+# before writing any text, so their caps get this much extra room
+THINKING_TOKENS = 2048
+
+
+def is_thinking_model(model_name):
+    name = (model_name or "").lower()
+    return "gemini-2.5" in name or "thinking" in name
+
+
+def _default_stats_path():
+    return os.getenv("DECKIQ_OUTPUT_STATS", os.path.join(".deckiq", "output_lengths.json"))
+
+
+def _load_overrides():
+    """
+    Read DECKIQ_GENERATION_PROFILES, either inline JSON or a path to a JSON file:
+    {"one_pager": {"max_output_tokens": 700, "temperature": 0.4}}
+    """
+    raw = os.getenv("DECKIQ_GENERATION_PROFILES", "").strip()
+    if not raw:
+        return {}
+    if not raw.startswith("{"):
+        with open(raw) as f:
+            raw = f.read()
+    return json.loads(raw)
+
+
+class GenerationProfiles:
+    """
+    Per-analysis generation settings with output-length based tuning.
+
+    Output token counts are recorded per analysis; once min_samples are
+    available the cap becomes p99 * headroom, clamped to sane bounds.
+    Truncated responses are recorded at the cap, so a cap that is too small
+    pushes p99 up and the cap grows on the next tuning pass. Values set
+    explicitly through config overrides are never auto-tuned.
+
+    Recorded lengths include thinking tokens. For thinking models, untuned
+    defaults get thinking_tokens of extra room and no cap, override
+    included, goes below MIN_OUTPUT_TOKENS + thinking_tokens. Samples are
+    written at most every save_interval seconds (and by flush()).
+    """
+
+    def __init__(self, stats_path=None, overrides=None, headroom=1.25,
+                 min_samples=20, max_samples=500, thinking_tokens=None, save_interval=30.0):
+        self.stats_path = stats_path or _default_stats_path()
+        self.overrides = _load_overrides() if overrides is None else overrides
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.thinking_tokens = thinking_tokens if thinking_tokens is not None else int(
+            os.getenv("DECKIQ_THINKING_TOKENS", str(THINKING_TOKENS))
+        )
+        self.save_interval = save_interval
+        self.last_saved = time.monotonic()
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.samples = self._load_samples()
+
+    def _load_samples(self):
+        try:
+            with open(self.stats_path) as f:
+                return {k: list(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_samples(self):
+        try:
+            directory = os.path.dirname(self.stats_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.stats_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.samples, f)
+            os.replace(tmp_path, self.stats_path)
+        except OSError:
+            pass
+
+    def percentile(self, analysis, pct):
+        """Nearest-rank percentile of recorded output lengths, or None"""
+        with self.lock:
+            values = sorted(self.samples.get(analysis, []))
+        if not values:
+            return None
+        rank = max(1, math.ceil(pct / 100 * len(values)))
+        return values[rank - 1]
+
+    def tuned_max_tokens(self, analysis):
+        """p99 output length plus headroom, or None when there is too little data"""
+        with self.lock:
+            count = len(self.samples.get(analysis, []))
+        if count < self.min_samples:
+            return None
+        p99 = self.percentile(analysis, 99)
+        return max(MIN_OUTPUT_TOKENS, min(MAX_OUTPUT_TOKENS, int(math.ceil(p99 * self.headroom))))
+
+    def get(self, analysis, model_name=None):
+        """Return the effective profile dict for an analysis (and the model it runs on)"""
+        profile = dict(DEFAULT_PROFILES.get(analysis, FALLBACK_PROFILE))
+        override = self.overrides.get(analysis, {})
+        thinking = is_thinking_model(model_name)
+
+        if 'max_output_tokens' not in override:
+            tuned = self.tuned_max_tokens(analysis)
+            if tuned is not None:
+                # Tuned from recorded lengths, which already include thoughts
+                profile['max_output_tokens'] = tuned
+            elif thinking:
+                profile['max_output_tokens'] += self.thinking_tokens
+
+        profile.update(override)
+        floor = MIN_OUTPUT_TOKENS + (self.thinking_tokens if thinking else 0)
+        profile['max_output_tokens'] = max(floor, profile['max_output_tokens'])
+        return profile
+
+    def record(self, analysis, output_tokens, truncated=False, model_name=None):
+        """Record the length of one generated output (text plus thinking tokens)"""
+        if truncated:
+            output_tokens = max(output_tokens, self.get(analysis, model_name)['max_output_tokens'])
+        with self.lock:
+            values = self.samples.setdefault(analysis, [])
+            values.append(int(output_tokens))
+            del values[:-self.max_samples]
+            self.dirty = True
+            if time.monotonic() - self.last_saved >= self.save_interval:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self.dirty:
+            self._save_samples()
+            self.dirty = False
+        self.last_saved = time.monotonic()
+
+    def flush(self):
+        """Write recorded samples that haven't been saved yet"""
+        with self.lock:
+            self._flush_locked()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_generation_profiles():
+    """Process-wide GenerationProfiles instance"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = GenerationProfiles()
+            atexit.register(_shared.flush)
+        return _shared
@@ -0,0 +1,69 @@
+import builtins
+import os
+import sys
+import threading
+import time
+
+
+ENV_VAR = "DECKIQ_IMPORT_PROFILE"
+
+_lock = threading.Lock()
+_installed = False
+_original_import = builtins.__import__
+_state = threading.local()
+
+
+def _output():
+    """Destination for timing lines: stderr for '1', otherwise the path given in the env var"""
+    target = os.getenv(ENV_VAR, "")
+    if target.lower() in ("1", "true", "yes", "stderr"):
+        return sys.stderr
+    return open(target, "a", buffering=1)
+
+
+def install_from_env():
+    """Enable import timing if DECKIQ_IMPORT_PROFILE is set. Safe to call on every rerun."""
+    if os.getenv(ENV_VAR):
+        install()
+
+
+def install(stream=None):
+    """
+    Time every first-time import, printing lines in the same layout as
+    `python -X importtime`: self and cumulative microseconds, nested modules indented.
+    Without a stream, the destination comes from DECKIQ_IMPORT_PROFILE; it is
+    only opened on the first call, so reruns don't leak file handles.
+    """
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        stream = stream or _output()
+        _installed = True
+
+    stream.write("import time: self [us] | cumulative | imported package\n")
+
+    def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return _original_import(name, globals, locals, fromlist, level)
+
+        stack = getattr(_state, "stack", None)
+        if stack is None:
+            stack = _state.stack = []
+
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return _original_import(name, globals, locals, fromlist, level)
+        finally:
+            cumulative = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += cumulative
+            self_time = cumulative - children
+            stream.write(
+                f"import time: {self_time * 1e6:9.0f} | {cumulative * 1e6:10.0f} | "
+                f"{'  ' * len(stack)}{name}\n"
+            )
+
+    builtins.__import__ = timed_import
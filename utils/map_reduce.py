@@ -0,0 +1,133 @@
+import hashlib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from utils.session_memory import SizedLRU
+
+
+# Extractors put this between pages/slides so long decks can be split on slide boundaries
+PAGE_BREAK = "\f"
+
+
+def split_pages(deck_text):
+    """Split extracted deck text into pages, dropping empty ones"""
+    return [page.strip() for page in deck_text.split(PAGE_BREAK) if page.strip()]
+
+
+def chunk_pages(pages, chunk_chars=8000):
+    """
+    Greedily group consecutive pages into chunks of at most chunk_chars.
+    Returns a list of (first_page, last_page, text) with 1-based page numbers;
+    oversized pages are split on their own.
+    """
+    chunks = []
+    current, first = [], None
+    size = 0
+
+    for number, page in enumerate(pages, start=1):
+        if len(page) > chunk_chars:
+            if current:
+                chunks.append((first, number - 1, "\n\n".join(current)))
+                current, first, size = [], None, 0
+            for start in range(0, len(page), chunk_chars):
+                chunks.append((number, number, page[start:start + chunk_chars]))
+            continue
+
+        if current and size + len(page) > chunk_chars:
+            chunks.append((first, number - 1, "\n\n".join(current)))
+            current, first, size = [], None, 0
+
+        if first is None:
+            first = number
+        current.append(page)
+        size += len(page)
+
+    if current:
+        chunks.append((first, len(pages), "\n\n".join(current)))
+    return chunks
+
+
+class ChunkCache(SizedLRU):
+    """Bounded, thread-safe LRU of per-chunk notes keyed by content hash"""
+
+    def __init__(self, max_entries=2048):
+        super().__init__("chunk_notes", max_entries=max_entries)
+
+    @staticmethod
+    def key(chunk_text, version=""):
+        return hashlib.sha256(f"{version}\0{chunk_text}".encode("utf-8")).hexdigest()
+
+
+_chunk_cache = ChunkCache()
+
+
+class ProgressRelay:
+    """
+    on_progress wrapper for worker threads: calls from the thread that
+    created it go straight through, calls from other threads are queued
+    until that thread runs drain(). Streamlit elements can only be written
+    from the script thread.
+    """
+
+    def __init__(self, on_progress):
+        self.on_progress = on_progress
+        self.owner = threading.get_ident()
+        self.events = queue.Queue()
+
+    def __call__(self, stage, message):
+        if threading.get_ident() == self.owner:
+            self.on_progress(stage, message)
+        else:
+            self.events.put((stage, message))
+
+    def drain(self):
+        while True:
+            try:
+                stage, message = self.events.get_nowait()
+            except queue.Empty:
+                return
+            self.on_progress(stage, message)
+
+
+def condense_deck(deck_text, generate, template, chunk_chars=8000, max_workers=4, cache=None,
+                  on_progress=None, fallback_chars=1500):
+    """
+    Map step: render the chunk_notes template for every chunk, run
+    generate(prompt) over them in parallel and return the notes joined in
+    page order. Notes are cached by chunk text and template version.
+    generate must return the model text or
+    an "Error..." string; failed chunks fall back to a clipped slice of their
+    raw text so the reduce step still sees every part of the deck.
+    on_progress is called on the calling thread (see ProgressRelay).
+    """
+    cache = cache if cache is not None else _chunk_cache
+    chunks = chunk_pages(split_pages(deck_text), chunk_chars)
+    if on_progress and not isinstance(on_progress, ProgressRelay):
+        on_progress = ProgressRelay(on_progress)
+
+    def label(first, last):
+        return f"page {first}" if first == last else f"pages {first}-{last}"
+
+    def run(chunk):
+        first, last, text = chunk
+        key = ChunkCache.key(text, template.version)
+        notes = cache.get(key)
+        if notes is None:
+            notes = generate(template.render(label=label(first, last), chunk=text))
+            if notes and not notes.startswith("Error"):
+                cache.put(key, notes)
+            else:
+                notes = text[:fallback_chars]
+        if on_progress:
+            on_progress("map", f"Condensed {label(first, last)} of {chunks[-1][1]}")
+        return f"[{label(first, last).title()}]\n{notes.strip()}"
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="deckiq-map") as pool:
+        futures = [pool.submit(run, chunk) for chunk in chunks]
+        pending = futures
+        while pending:
+            _, pending = wait(pending, timeout=0.1)
+            if on_progress:
+                on_progress.drain()
+        return "\n\n".join(future.result() for future in futures)
@@ -0,0 +1,84 @@
+import re
+
+
+HEADER_RE = re.compile(r"^(#{2,3})\s+(.*\S)\s*$")
+FENCE_PREFIXES = ("```", "~~~")
+
+
+class MarkdownSection:
+    """One ##/### section of a Markdown document (level 0 and no title for text before the first header)"""
+
+    __slots__ = ("level", "title", "lines")
+
+    def __init__(self, level=0, title=None, lines=None):
+        self.level = level
+        self.title = title
+        self.lines = lines or []
+
+    @property
+    def header(self):
+        return self.lines[0] if self.title is not None else ""
+
+    @property
+    def body(self):
+        """Section text without its header line"""
+        lines = self.lines[1:] if self.title is not None else self.lines
+        return "\n".join(lines).strip("\n")
+
+    @property
+    def text(self):
+        return "\n".join(self.lines).strip("\n")
+
+    def has_content(self):
+        return any(line.strip() for line in self.lines)
+
+
+class SectionParser:
+    """
+    Incremental Markdown splitter for streamed model output.
+
+    feed() takes text chunks as they arrive and returns the sections
+    completed by them. A section is complete once the next ## or ### header
+    line has fully arrived; headers inside code fences don't count. finish()
+    returns the last section.
+    """
+
+    def __init__(self):
+        self.partial = ""
+        self.current = MarkdownSection()
+        self.in_fence = False
+
+    def feed(self, chunk):
+        self.partial += chunk
+        *lines, self.partial = self.partial.split("\n")
+        completed = []
+        for line in lines:
+            if line.lstrip().startswith(FENCE_PREFIXES):
+                self.in_fence = not self.in_fence
+            match = None if self.in_fence else HEADER_RE.match(line)
+            if match:
+                if self.current.has_content():
+                    completed.append(self.current)
+                self.current = MarkdownSection(len(match.group(1)), match.group(2), [line])
+            else:
+                self.current.lines.append(line)
+        return completed
+
+    @property
+    def pending(self):
+        """The in-progress section, including any incomplete last line"""
+        return "\n".join(self.current.lines + [self.partial]).strip("\n")
+
+    def finish(self):
+        """Flush the remaining text; returns the final sections (at most one, or two if the tail was a header)"""
+        completed = self.feed("\n") if self.partial else []
+        if self.current.has_content():
+            completed.append(self.current)
+        self.current = MarkdownSection()
+        return completed
+
+
+def split_sections(text):
+    """All sections of a complete Markdown document"""
+    parser = SectionParser()
+    return parser.feed(text) + parser.finish()
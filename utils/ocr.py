@@ -0,0 +1,169 @@
+import atexit
+import hashlib
+import logging
+import os
+import threading
+
+from utils.profiling import profiled
+from utils.session_memory import SizedLRU
+
+
+logger = logging.getLogger(__name__)
+
+# Pages with fewer visible characters than this (and at least one image) get OCR'd
+MIN_TEXT_CHARS = 20
+MIN_DPI = 150
+MAX_DPI = 400
+
+
+def ocr_enabled():
+    """OCR fallback switch: DECKIQ_OCR=0 turns it off"""
+    return os.getenv("DECKIQ_OCR", "1").lower() not in ("0", "false", "no")
+
+
+_available = None
+
+
+def ocr_available():
+    """True when PyMuPDF can find Tesseract's language data"""
+    global _available
+    if _available is None:
+        import fitz  # PyMuPDF
+
+        try:
+            fitz.get_tessdata()
+            _available = True
+        except (RuntimeError, AttributeError):
+            _available = False
+    return _available
+
+
+def needs_ocr(page, text):
+    """A page with (almost) no text layer but with images is probably a scan or exported slide"""
+    return len("".join(text.split())) < MIN_TEXT_CHARS and bool(page.get_images(full=False))
+
+
+def ocr_dpi(page):
+    """
+    Resolution to OCR a page at: the effective resolution of its largest
+    image (upsampling beyond the source adds work, not accuracy), clamped to
+    a range Tesseract reads well.
+    """
+    best = 0
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = info["bbox"]
+        if x1 - x0 > 0 and info["width"]:
+            best = max(best, info["width"] / ((x1 - x0) / 72))
+    if not best:
+        best = 300
+    return int(min(MAX_DPI, max(MIN_DPI, best)))
+
+
+def page_hash(doc, page, dpi, language):
+    """Content hash of a page (content stream and raw image data) plus OCR settings"""
+    digest = hashlib.sha256(f"{dpi}:{language}:{page.rotation}".encode())
+    digest.update(page.read_contents())
+    for image in page.get_images(full=False):
+        digest.update(doc.xref_stream_raw(image[0]) or b"")
+    return digest.hexdigest()
+
+
+def _ocr_pages(data, pages, language):
+    """OCR (page_number, dpi) pairs of a PDF; runs in-process or in a pool worker"""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        recognized = []
+        for number, dpi in pages:
+            page = doc[number]
+            textpage = page.get_textpage_ocr(dpi=dpi, full=True, language=language)
+            recognized.append((number, page.get_text(textpage=textpage)))
+        return recognized
+    finally:
+        doc.close()
+
+
+class PageOCR:
+    """
+    OCR fallback for PDF pages without a text layer.
+
+    Only pages that need it are OCR'd, each at its own resolution, and the
+    text is cached by page content hash, so re-uploads and slides shared
+    between decks are not OCR'd twice. Tesseract runs inside PyMuPDF and
+    holds the GIL, so several pages go to a process pool in parallel.
+    """
+
+    def __init__(self, language=None, max_workers=None, max_pages=None, cache_entries=2048):
+        self.language = language or os.getenv("DECKIQ_OCR_LANGUAGE", "eng")
+        self.max_workers = max_workers or int(os.getenv("DECKIQ_OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.max_pages = max_pages or int(os.getenv("DECKIQ_OCR_MAX_PAGES", "60"))
+        self.cache = SizedLRU("ocr", max_entries=cache_entries)
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def _get_pool(self):
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+
+        with self.lock:
+            if self.pool is None:
+                # spawn: forking a threaded server process is unsafe
+                self.pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+                atexit.register(self.pool.shutdown, wait=False)
+            return self.pool
+
+    def _recognize_missing(self, data, pages):
+        if self.max_workers <= 1 or len(pages) <= 1:
+            return _ocr_pages(data, pages, self.language)
+
+        groups = [pages[i::self.max_workers] for i in range(self.max_workers)]
+        pool = self._get_pool()
+        futures = [pool.submit(_ocr_pages, data, group, self.language) for group in groups if group]
+        return [item for future in futures for item in future.result()]
+
+    @profiled("ocr")
+    def recognize(self, data, doc, page_numbers):
+        """
+        OCR text for the given 0-based pages of an open document, as
+        {page_number: text}. data is the PDF's bytes, for pool workers.
+        """
+        dpis = {number: ocr_dpi(doc[number]) for number in page_numbers[:self.max_pages]}
+        keys = {number: page_hash(doc, doc[number], dpi, self.language) for number, dpi in dpis.items()}
+        found = {}
+        missing = {}
+        for number, dpi in dpis.items():
+            text = self.cache.get(keys[number])
+            if text is None:
+                # Identical pages (repeated scans, template slides) are OCR'd once
+                missing.setdefault(keys[number], (number, dpi))
+            else:
+                found[number] = text
+
+        if missing:
+            try:
+                recognized = self._recognize_missing(data, list(missing.values()))
+            except Exception as e:
+                # A failed OCR run leaves those pages with their native text
+                logger.warning("OCR failed for %d page(s): %s", len(missing), e)
+                return found
+            for number, text in recognized:
+                self.cache.put(keys[number], text)
+            texts = {keys[number]: text for number, text in recognized}
+            for number in dpis:
+                if number not in found and keys[number] in texts:
+                    found[number] = texts[keys[number]]
+        return found
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_page_ocr():
+    """Process-wide PageOCR"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PageOCR()
+        return _shared
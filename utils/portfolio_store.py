@@ -0,0 +1,232 @@
+import atexit
+import datetime
+import logging
+import os
+import threading
+import time
+import uuid
+
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES = ["y_combinator", "sequoia_capital"]
+METRICS = ["mrr", "arr", "revenue", "tam", "customers", "users", "growth", "raise"]
+COMPACT_LOCK = ".compact.lock"
+STALE_LOCK_SECONDS = 600
+
+
+def _schema():
+    import pyarrow as pa
+
+    fields = [
+        ("event", pa.string()),            # "upload" or an analysis name
+        ("deck_id", pa.string()),
+        ("analyzed_at", pa.timestamp("ms", tz="UTC")),
+        ("file_type", pa.string()),
+        ("chars", pa.int64()),
+        ("seconds", pa.float64()),
+        ("ok", pa.bool_()),
+    ]
+    for template in TEMPLATES:
+        fields.append((f"coverage_{template}", pa.float64()))
+        fields.append((f"missing_{template}", pa.list_(pa.string())))
+    for metric in METRICS:
+        fields.append((f"metric_{metric}", pa.float64()))
+    return pa.schema(fields)
+
+
+def _take_lock(path):
+    """Create the lock file; a lock left behind by a crashed process expires after STALE_LOCK_SECONDS"""
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) < STALE_LOCK_SECONDS:
+                    return False
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return False
+
+
+class PortfolioStore:
+    """
+    Append-only Parquet dataset of per-deck results, hive-partitioned by
+    date (root/date=YYYY-MM-DD/part-*.parquet).
+
+    Each upload writes one "upload" row (coverage per template, missing
+    sections, extracted metrics, extraction time) and each analysis writes a
+    row with its timing. Rows are buffered and written as one part file per
+    batch_size rows or max_age seconds, and at exit. The first flush of a
+    new day compacts earlier partitions into one file each, so scans stay
+    fast as the dataset grows.
+    """
+
+    def __init__(self, root=None, batch_size=None, max_age=60.0):
+        self.root = root or os.getenv("DECKIQ_PORTFOLIO_DIR", os.path.join(".deckiq", "portfolio"))
+        self.batch_size = batch_size or int(os.getenv("DECKIQ_PORTFOLIO_BATCH", "200"))
+        self.max_age = max_age
+        self.buffer = []
+        self.oldest = None
+        self.compacted_before = None
+        self.lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def _row(self, event, deck_id, **fields):
+        row = {name: None for name in _schema().names}
+        row.update(event=event, deck_id=deck_id,
+                   analyzed_at=datetime.datetime.now(datetime.timezone.utc))
+        row.update(fields)
+        return row
+
+    def record_upload(self, deck_id, file_type, deck_text, checker, facts, seconds):
+        """Append the deck-level row: coverage and gaps per template plus key metrics"""
+        fields = {"file_type": file_type, "chars": len(deck_text), "seconds": seconds, "ok": True}
+        for template in TEMPLATES:
+            missing = checker.check_template_gaps(deck_text, template, facts)
+            total = len(checker.templates[template]['required_sections'])
+            fields[f"coverage_{template}"] = round((total - len(missing)) / total * 100, 1)
+            fields[f"missing_{template}"] = missing
+        for metric in METRICS:
+            fact = facts.get(metric)
+            fields[f"metric_{metric}"] = fact.value if fact else None
+        self.append(self._row("upload", deck_id, **fields))
+
+    def record_analysis(self, deck_id, analysis, seconds, ok):
+        """Append a timing row for one analysis"""
+        self.append(self._row(analysis, deck_id, seconds=seconds, ok=ok))
+
+    def append(self, row):
+        with self.lock:
+            if not self.buffer:
+                self.oldest = time.monotonic()
+            self.buffer.append(row)
+            if len(self.buffer) >= self.batch_size or time.monotonic() - self.oldest >= self.max_age:
+                self._flush_locked()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self.buffer:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        rows, self.buffer = self.buffer, []
+        by_date = {}
+        for row in rows:
+            by_date.setdefault(row["analyzed_at"].date().isoformat(), []).append(row)
+
+        for date, date_rows in by_date.items():
+            directory = os.path.join(self.root, f"date={date}")
+            os.makedirs(directory, exist_ok=True)
+            table = pa.Table.from_pylist(date_rows, schema=_schema())
+            pq.write_table(table, os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet"))
+
+        today = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+        if self.compacted_before != today:
+            self.compacted_before = today
+            self._compact_closed(today)
+
+    def _compact_closed(self, today):
+        """Compact every partition before today; closed days only get late rows from other processes"""
+        import pyarrow as pa
+
+        for name in sorted(os.listdir(self.root)):
+            if name.startswith("date=") and name[len("date="):] < today:
+                try:
+                    self.compact(name[len("date="):])
+                except (OSError, pa.ArrowException) as e:
+                    logger.warning("Portfolio compaction failed for %s: %s", name, e)
+
+    def compact(self, date):
+        """
+        Merge a partition's part files into one file. A lock file keeps
+        processes from compacting the same partition twice; the merged file
+        is written under a temporary name and renamed into place before the
+        parts it replaces are removed, so readers never see a partial file
+        and a failure leaves the original parts untouched.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        directory = os.path.join(self.root, f"date={date}")
+        lock_path = os.path.join(directory, COMPACT_LOCK)
+        if not _take_lock(lock_path):
+            return
+        try:
+            parts = sorted(
+                os.path.join(directory, name) for name in os.listdir(directory)
+                if name.endswith(".parquet")
+            )
+            if len(parts) < 2:
+                return
+            table = pa.concat_tables([pq.read_table(path, partitioning=None) for path in parts])
+            name = f"part-{uuid.uuid4().hex}"
+            temp = os.path.join(directory, f".{name}.tmp")
+            try:
+                pq.write_table(table, temp)
+                os.replace(temp, os.path.join(directory, f"{name}.parquet"))
+            except BaseException:
+                if os.path.exists(temp):
+                    os.remove(temp)
+                raise
+            for path in parts:
+                os.remove(path)
+        finally:
+            os.remove(lock_path)
+
+    def load(self, start=None, end=None, columns=None, events=None):
+        """
+        Read rows as a pandas DataFrame. start/end are dates (or ISO strings)
+        that prune whole partitions; event and column selection are pushed
+        down to the Parquet scan.
+        """
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        self.flush()
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=columns or _schema().names)
+
+        condition = None
+        if start is not None:
+            condition = ds.field("date") >= str(start)
+        if end is not None:
+            upper = ds.field("date") <= str(end)
+            condition = upper if condition is None else condition & upper
+        if events is not None:
+            selected = ds.field("event").isin(list(events))
+            condition = selected if condition is None else condition & selected
+
+        partition_schema = pa.schema([("date", pa.string())])
+        for attempt in range(2):
+            dataset = ds.dataset(
+                self.root, format="parquet",
+                partitioning=ds.partitioning(partition_schema, flavor="hive"),
+                schema=pa.unify_schemas([_schema(), partition_schema])
+            )
+            try:
+                return dataset.to_table(columns=columns, filter=condition).to_pandas()
+            except FileNotFoundError:
+                # Another process compacted a partition between listing and reading it
+                if attempt:
+                    raise
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_portfolio_store():
+    """Process-wide PortfolioStore, shared by the app and the dashboard page so buffered rows are visible to both"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PortfolioStore()
+        return _shared
@@ -0,0 +1,261 @@
+import contextlib
+import functools
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+ENV_VAR = "DECKIQ_PROFILE"
+QUERY_ENV_VAR = "DECKIQ_PROFILE_ALLOW_QUERY"
+
+_local = threading.local()
+_NULL = contextlib.nullcontext()
+# The profiler's own context-manager plumbing is left out of the stacks
+_TRANSPARENT = {os.path.abspath(__file__), os.path.abspath(contextlib.__file__)}
+
+# tracemalloc is process-wide: concurrent sessions share it and the last one out stops it
+_tracing_lock = threading.Lock()
+_tracing_sessions = 0
+_started_tracing = False
+
+
+def enabled_from_env():
+    return os.getenv(ENV_VAR, "").lower() in ("1", "true", "yes")
+
+
+def query_allowed():
+    """Whether callers may turn profiling on per request (?profile=1); off unless DECKIQ_PROFILE_ALLOW_QUERY is set"""
+    return os.getenv(QUERY_ENV_VAR, "").lower() in ("1", "true", "yes")
+
+
+def _frame_label(func):
+    """'name (file.py:line)' for Python functions, the bare name for builtins"""
+    filename, line, name = func
+    label = name if filename == "~" else f"{name} ({os.path.basename(filename)}:{line})"
+    # ';' separates frames in the collapsed format (the count follows the last space)
+    return label.replace(";", ",")
+
+
+def collapse_stats(stats, prefix, min_seconds=1e-5, max_depth=64):
+    """
+    Convert cProfile stats into collapsed stacks ('a;b;c microseconds'),
+    the input format of flamegraph.pl, speedscope and inferno.
+
+    cProfile records caller->callee edges rather than full stacks, so each
+    path gets its share of a function's time in proportion to the edge's
+    cumulative time (the usual cProfile-to-flamegraph approximation).
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge[3]
+
+    stacks = Counter()
+
+    def walk(func, path, weight):
+        total = stats[func][3]
+        ratio = weight / total if total else 0.0
+        if os.path.abspath(func[0]) not in _TRANSPARENT:
+            path = path + [_frame_label(func)]
+        own = stats[func][2] * ratio
+        if own >= min_seconds:
+            stacks[";".join(path)] += int(own * 1e6)
+        if len(path) >= max_depth:
+            return
+        for callee, edge_seconds in callees.get(func, {}).items():
+            child = edge_seconds * ratio
+            if child >= min_seconds and _frame_label(callee) not in path:
+                walk(callee, path, child)
+
+    for func, (_, _, _, cumulative, callers) in stats.items():
+        if not callers:
+            walk(func, [prefix], cumulative)
+    return stacks
+
+
+class StageStats:
+    __slots__ = ("calls", "wall", "cpu", "peak")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak = 0
+
+
+class ProfileSession:
+    """
+    Per-stage profile of one run (a Streamlit script run or an API job).
+
+    Every stage records wall time, CPU time of its thread and peak traced
+    allocation above what was live when it started. The outermost stage on
+    a thread also runs cProfile, whose stats are folded into collapsed
+    stacks rooted at the stage name. tracemalloc is process-wide, so peaks of
+    stages that overlap with other threads include their allocations too.
+    """
+
+    def __init__(self, label, output_dir=None):
+        import tracemalloc
+
+        self.label = label
+        self.output_dir = output_dir or os.getenv("DECKIQ_PROFILE_DIR", os.path.join(".deckiq", "profiles"))
+        self.started = time.time()
+        self.stages = OrderedDict()
+        self.stacks = Counter()
+        self.lock = threading.Lock()
+        self.paths = []
+
+        global _tracing_sessions, _started_tracing
+        with _tracing_lock:
+            if _tracing_sessions == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _started_tracing = True
+            _tracing_sessions += 1
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        import cProfile
+        import pstats
+        import tracemalloc
+
+        frames = getattr(_local, "frames", None)
+        if frames is None:
+            frames = _local.frames = []
+        if frames:
+            # Carry the parent's peak so far past the reset below
+            frames[-1][1] = max(frames[-1][1], tracemalloc.get_traced_memory()[1])
+
+        profiler = None
+        if not frames:
+            profiler = cProfile.Profile()
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        frames.append([name, 0])
+        with self.lock:
+            self.stages.setdefault(name, StageStats())
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one active cProfile per process; time the stage without stacks
+                profiler = None
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            cpu = time.thread_time() - cpu
+            wall = time.perf_counter() - wall
+            _, peak = frames.pop()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            if frames:
+                frames[-1][1] = max(frames[-1][1], peak)
+
+            stacks = collapse_stats(pstats.Stats(profiler).stats, name) if profiler is not None else None
+            with self.lock:
+                stats = self.stages[name]
+                stats.calls += 1
+                stats.wall += wall
+                stats.cpu += cpu
+                stats.peak = max(stats.peak, peak - base)
+                if stacks:
+                    self.stacks.update(stacks)
+
+    def table(self):
+        """Per-stage rows, in the order stages first ran"""
+        with self.lock:
+            return [
+                {
+                    "stage": name,
+                    "calls": stats.calls,
+                    "wall_s": round(stats.wall, 4),
+                    "cpu_s": round(stats.cpu, 4),
+                    "peak_kb": round(stats.peak / 1024, 1),
+                }
+                for name, stats in self.stages.items()
+            ]
+
+    def format_table(self):
+        lines = [f"   {'stage':<24} {'calls':>6} {'wall s':>9} {'cpu s':>9} {'peak KB':>10}"]
+        for row in self.table():
+            lines.append(
+                f"   {row['stage']:<24} {row['calls']:>6} {row['wall_s']:>9.4f} "
+                f"{row['cpu_s']:>9.4f} {row['peak_kb']:>10.1f}"
+            )
+        return "\n".join(lines)
+
+    def write(self):
+        """Write <run>.collapsed and <run>.stages.txt; returns their paths"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started)) + f"{self.started % 1:.3f}"[1:]
+        base = os.path.join(self.output_dir, f"{stamp}-{re.sub(r'[^A-Za-z0-9_.-]+', '_', self.label)}")
+        with self.lock:
+            stacks = sorted(self.stacks.items())
+        with open(base + ".collapsed", "w") as f:
+            f.writelines(f"{stack} {micros}\n" for stack, micros in stacks if micros > 0)
+        with open(base + ".stages.txt", "w") as f:
+            f.write(f"{self.label} ({time.ctime(self.started)})\n{self.format_table()}\n")
+        return base + ".collapsed", base + ".stages.txt"
+
+    def close(self):
+        import tracemalloc
+
+        global _tracing_sessions, _started_tracing
+        with _tracing_lock:
+            _tracing_sessions -= 1
+            if _tracing_sessions == 0 and _started_tracing:
+                tracemalloc.stop()
+                _started_tracing = False
+
+
+@contextlib.contextmanager
+def profile_run(label, enabled=None):
+    """
+    Profile the stages run by this thread inside the block, then write the
+    flamegraph and stage table. Yields the ProfileSession, or None when
+    profiling is off (DECKIQ_PROFILE unset and enabled not True).
+    """
+    if not (enabled_from_env() if enabled is None else enabled) or getattr(_local, "session", None):
+        yield None
+        return
+    session = _local.session = ProfileSession(label)
+    try:
+        yield session
+    finally:
+        _local.session = None
+        session.close()
+        if session.stages:
+            try:
+                session.paths = list(session.write())
+                logger.info("Profile for %s: %s (flamegraph)\n%s", label, session.paths[0], session.format_table())
+            except OSError as e:
+                logger.warning("Profile write failed: %s", e)
+
+
+def stage(name):
+    """Context manager timing a pipeline stage; a shared no-op when not profiling"""
+    session = getattr(_local, "session", None)
+    if session is None:
+        return _NULL
+    return session.stage(name)
+
+
+def profiled(name):
+    """Decorator form of stage() for functions that are a whole stage"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            session = getattr(_local, "session", None)
+            if session is None:
+                return func(*args, **kwargs)
+            with session.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import math
+import os
+import string
+import textwrap
+import threading
+
+from utils.prompts import PROMPTS
+
+
+def estimate_tokens(text):
+    """Local token estimate (~4 characters per token for Gemini on English text)"""
+    return math.ceil(len(text) / 4)
+
+
+class PromptTemplate:
+    """
+    A dedented prompt compiled once into literal segments and field names.
+    Rendering is a single join; the token count of the literal text is
+    computed up front so budget checks only need to size the fields.
+    """
+
+    def __init__(self, name, variant, text):
+        self.name = name
+        self.variant = variant
+        self.text = textwrap.dedent(text).strip("\n") + "\n"
+        self.version = hashlib.sha256(f"{name}\0{variant}\0{self.text}".encode("utf-8")).hexdigest()[:12]
+
+        self.segments = []
+        self.fields = []
+        for literal, field, _, _ in string.Formatter().parse(self.text):
+            self.segments.append(literal)
+            if field is not None:
+                self.fields.append(field)
+        self.static_text = "".join(self.segments)
+        self.static_tokens = estimate_tokens(self.static_text)
+
+    @property
+    def key(self):
+        """Cache key component: analysis@version"""
+        return f"{self.name}@{self.version}"
+
+    def render(self, **values):
+        parts = []
+        for i, literal in enumerate(self.segments):
+            parts.append(literal)
+            if i < len(self.fields):
+                parts.append(str(values[self.fields[i]]))
+        return "".join(parts)
+
+    def estimate_tokens(self, **values):
+        """Static tokens plus an estimate for the supplied field values only"""
+        return self.static_tokens + sum(
+            estimate_tokens(str(values.get(field, ""))) for field in self.fields
+        )
+
+
+class PromptRegistry:
+    """
+    Versioned prompt templates with A/B variants and per-variant stats.
+
+    Variant weights come from DECKIQ_PROMPT_VARIANTS, e.g.
+    {"one_pager": {"default": 0.5, "concise": 0.5}}; without weights the
+    "default" variant is used. Selection hashes a stable key (the deck) so a
+    deck always gets the same variant and its cached outputs stay valid.
+    """
+
+    def __init__(self, prompts=None, weights=None):
+        self.templates = {
+            name: {variant: PromptTemplate(name, variant, text) for variant, text in variants.items()}
+            for name, variants in (prompts or PROMPTS).items()
+        }
+        self.weights = weights if weights is not None else self._load_weights()
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def _load_weights(self):
+        raw = os.getenv("DECKIQ_PROMPT_VARIANTS", "").strip()
+        return json.loads(raw) if raw else {}
+
+    def get(self, name, variant="default"):
+        return self.templates[name][variant]
+
+    def variants(self, name):
+        return list(self.templates[name].keys())
+
+    def select(self, name, key=""):
+        """Pick the variant for a stable key according to the configured weights"""
+        weights = {
+            variant: weight for variant, weight in self.weights.get(name, {}).items()
+            if variant in self.templates[name] and weight > 0
+        }
+        if not weights:
+            return self.templates[name].get("default") or next(iter(self.templates[name].values()))
+
+        bucket = int(hashlib.sha256(f"{name}\0{key}".encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+        threshold = 0.0
+        total = sum(weights.values())
+        for variant, weight in sorted(weights.items()):
+            threshold += weight / total
+            if bucket <= threshold:
+                return self.templates[name][variant]
+        return self.templates[name][variant]
+
+    def record(self, template, seconds, input_tokens, output_tokens, ok=True):
+        """Accumulate latency and token stats for one call of a variant"""
+        with self.lock:
+            entry = self.stats.setdefault(template.key, {
+                "name": template.name,
+                "variant": template.variant,
+                "calls": 0,
+                "errors": 0,
+                "seconds": 0.0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+            })
+            entry["calls"] += 1
+            entry["errors"] += 0 if ok else 1
+            entry["seconds"] += seconds
+            entry["input_tokens"] += input_tokens
+            entry["output_tokens"] += output_tokens
+
+    def summary(self):
+        """Per-variant averages for comparing A/B variants"""
+        with self.lock:
+            rows = []
+            for key, entry in self.stats.items():
+                calls = entry["calls"] or 1
+                rows.append({
+                    "prompt": key,
+                    "name": entry["name"],
+                    "variant": entry["variant"],
+                    "calls": entry["calls"],
+                    "error_rate": entry["errors"] / calls,
+                    "avg_seconds": entry["seconds"] / calls,
+                    "avg_input_tokens": entry["input_tokens"] / calls,
+                    "avg_output_tokens": entry["output_tokens"] / calls,
+                })
+            return rows
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_prompt_registry():
+    """Process-wide PromptRegistry"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PromptRegistry()
+        return _shared
@@ -0,0 +1,211 @@
+import calendar
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# Prefix of the user-facing error GeminiHelper returns for rejected requests
+BUDGET_ERROR = "Error: Daily token budget reached"
+
+
+class QuotaExceeded(Exception):
+    """A request would take a user past their daily token budget"""
+
+    def __init__(self, user, needed, remaining, budget):
+        super().__init__(
+            f"Daily token budget exhausted for {user}: request needs ~{needed:,} tokens, "
+            f"{remaining:,} of {budget:,} left today"
+        )
+        self.user = user
+        self.needed = needed
+        self.remaining = remaining
+        self.budget = budget
+
+
+class Reservation:
+    __slots__ = ("user", "day", "tokens")
+
+    def __init__(self, user, day, tokens):
+        self.user = user
+        self.day = day
+        self.tokens = tokens
+
+
+def today():
+    """Ledger day (UTC), so budgets reset at the same moment as the API's daily quotas"""
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+def seconds_until_reset():
+    now = time.time()
+    midnight = calendar.timegm(time.strptime(today(), "%Y-%m-%d")) + 86400
+    return max(0, int(midnight - now))
+
+
+def trusted_proxies():
+    """Peer addresses allowed to assert a caller identity (DECKIQ_TRUSTED_PROXIES, comma-separated)"""
+    return {address.strip() for address in os.getenv("DECKIQ_TRUSTED_PROXIES", "").split(",") if address.strip()}
+
+
+def client_identity(peer, headers):
+    """
+    Budget identity of a caller connected from peer. Only a trusted proxy
+    may name the user (X-DeckIQ-User) or the original client
+    (X-Forwarded-For, first hop); anyone else is budgeted by address, so a
+    made-up header can't buy a fresh budget.
+    """
+    if peer in trusted_proxies():
+        user = (headers.get("X-DeckIQ-User") or "").strip()
+        if user:
+            return user
+        forwarded = (headers.get("X-Forwarded-For") or "").split(",")[0].strip()
+        if forwarded:
+            return forwarded
+    return peer
+
+
+def streamlit_user_id():
+    """
+    Identity of the current Streamlit session: the signed-in user's email
+    when Streamlit auth is configured, otherwise the client address, so
+    reloading the page keeps the same budget and archive
+    """
+    import streamlit as st
+
+    try:
+        if st.user.is_logged_in:
+            return st.user.email
+    except (AttributeError, KeyError):
+        pass
+    # Streamlit reports local connections (including a reverse proxy on this host) as None
+    peer = st.context.ip_address or "127.0.0.1"
+    return client_identity(peer, st.context.headers)
+
+
+class TokenLedger:
+    """
+    Per-user, per-day token ledger with admission control.
+
+    Before a model call, reserve() books the pre-flight estimate (prompt
+    tokens plus the output cap). A request that cannot fit in what the user
+    has left today is rejected with QuotaExceeded before any network call.
+    One that only fails because of other in-flight reservations (which are
+    upper bounds) is deferred until they settle, up to defer_timeout seconds.
+    settle() swaps the reservation for the tokens actually billed.
+
+    DECKIQ_DAILY_TOKEN_BUDGET sets the per-user budget (0 = unlimited, usage
+    is still recorded) and DECKIQ_USER_TOKEN_BUDGETS ('{"user": tokens}')
+    overrides it per user. Usage is stored in SQLite, so it survives restarts
+    and is shared by processes pointing at the same DECKIQ_QUOTA_DB.
+    """
+
+    def __init__(self, path=None, daily_budget=None, user_budgets=None, defer_timeout=None):
+        self.path = path or os.getenv("DECKIQ_QUOTA_DB", os.path.join(".deckiq", "quota.sqlite3"))
+        self.daily_budget = daily_budget if daily_budget is not None else int(os.getenv("DECKIQ_DAILY_TOKEN_BUDGET", "0"))
+        self.user_budgets = user_budgets if user_budgets is not None else self._load_user_budgets()
+        self.defer_timeout = defer_timeout if defer_timeout is not None else float(os.getenv("DECKIQ_QUOTA_DEFER_SECONDS", "30"))
+        # (user, day) -> tokens reserved by in-flight requests
+        self.pending = {}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.condition = threading.Condition()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS usage (
+                user TEXT NOT NULL,
+                day TEXT NOT NULL,
+                tokens INTEGER NOT NULL,
+                requests INTEGER NOT NULL,
+                PRIMARY KEY (user, day)
+            )
+        """)
+        self.conn.commit()
+
+    def _load_user_budgets(self):
+        raw = os.getenv("DECKIQ_USER_TOKEN_BUDGETS", "").strip()
+        return {user: int(tokens) for user, tokens in json.loads(raw).items()} if raw else {}
+
+    def budget(self, user):
+        """Daily budget for a user; 0 means unlimited"""
+        return self.user_budgets.get(user, self.daily_budget)
+
+    def _used_locked(self, user, day):
+        row = self.conn.execute(
+            "SELECT tokens FROM usage WHERE user = ? AND day = ?", (user, day)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def reserve(self, user, tokens, timeout=None):
+        """Book an estimated cost; raises QuotaExceeded if it can't fit today"""
+        budget = self.budget(user)
+        day = today()
+        key = (user, day)
+        deadline = time.monotonic() + (self.defer_timeout if timeout is None else timeout)
+
+        with self.condition:
+            while budget:
+                used = self._used_locked(user, day)
+                pending = self.pending.get(key, 0)
+                if used + pending + tokens <= budget:
+                    break
+                remaining = deadline - time.monotonic()
+                if used + tokens > budget or remaining <= 0:
+                    raise QuotaExceeded(user, tokens, max(0, budget - used - pending), budget)
+                # Fits once in-flight requests settle below their estimates
+                self.condition.wait(remaining)
+            self.pending[key] = self.pending.get(key, 0) + tokens
+            return Reservation(user, day, tokens)
+
+    def settle(self, reservation, tokens):
+        """Release a reservation and record the tokens actually billed (0 if the call failed)"""
+        with self.condition:
+            key = (reservation.user, reservation.day)
+            left = self.pending.get(key, 0) - reservation.tokens
+            if left > 0:
+                self.pending[key] = left
+            else:
+                self.pending.pop(key, None)
+            if tokens:
+                with self.conn:
+                    self.conn.execute(
+                        "INSERT INTO usage (user, day, tokens, requests) VALUES (?, ?, ?, 1) "
+                        "ON CONFLICT (user, day) DO UPDATE SET "
+                        "tokens = tokens + excluded.tokens, requests = requests + 1",
+                        (reservation.user, reservation.day, tokens)
+                    )
+            self.condition.notify_all()
+
+    def status(self, user):
+        """Today's budget, usage and remaining tokens for a user (remaining is None when unlimited)"""
+        budget = self.budget(user)
+        day = today()
+        with self.condition:
+            used = self._used_locked(user, day)
+            reserved = self.pending.get((user, day), 0)
+        return {
+            "user": user,
+            "day": day,
+            "budget": budget,
+            "used": used,
+            "reserved": reserved,
+            "remaining": max(0, budget - used - reserved) if budget else None,
+            "resets_in": seconds_until_reset(),
+        }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_token_ledger():
+    """Process-wide TokenLedger shared by all helpers"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = TokenLedger()
+        return _shared
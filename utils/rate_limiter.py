@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket limiting model requests per minute.
+    Unlimited unless DECKIQ_REQUESTS_PER_MINUTE is set to match your quota
+    (15 for the Gemini free tier); 0 also means unlimited.
+    """
+
+    def __init__(self, requests_per_minute=None, burst=None):
+        if requests_per_minute is None:
+            requests_per_minute = float(os.getenv("DECKIQ_REQUESTS_PER_MINUTE") or 0)
+        self.rate = max(0.0, requests_per_minute) / 60.0
+        self.capacity = burst or max(1.0, self.rate * 60 / 4)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """Take one token only if one is available right now"""
+        if not self.rate:
+            return True
+        with self.condition:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def acquire(self, timeout=None):
+        """Take one token, waiting up to timeout seconds. Returns False on timeout."""
+        if not self.rate:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = min(wait, remaining)
+                self.condition.wait(wait)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Process-wide RateLimiter shared by all helpers"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RateLimiter()
+        return _shared
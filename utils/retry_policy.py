@@ -0,0 +1,144 @@
+import asyncio
+import random
+import re
+import threading
+import time
+
+
+# Error categories returned by RetryPolicy.classify
+RATE_LIMIT = "rate_limit"
+TRANSIENT = "transient"
+AUTH = "auth"
+NOT_FOUND = "not_found"
+INVALID = "invalid"
+UNKNOWN = "unknown"
+
+RETRYABLE = (RATE_LIMIT, TRANSIENT, UNKNOWN)
+
+_RETRY_DELAY_RE = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)(?:\s*nanos:\s*(\d+))?")
+_RETRY_IN_RE = re.compile(r"retry in\s+([\d.]+)\s*s", re.IGNORECASE)
+
+
+def _api_errors():
+    """Import google.api_core exceptions on first use (ships with google-generativeai)"""
+    try:
+        from google.api_core import exceptions
+        return exceptions
+    except ImportError:
+        return None
+
+
+class RetryError(Exception):
+    """Raised when a call fails permanently or the retry budget is exhausted"""
+
+    def __init__(self, category, last_exception, attempts):
+        super().__init__(f"{category} after {attempts} attempt(s): {last_exception}")
+        self.category = category
+        self.last_exception = last_exception
+        self.attempts = attempts
+
+
+class RetryPolicy:
+    """
+    Deadline-aware retry policy with typed error classification.
+
+    Backoff uses decorrelated jitter and honours server retry hints
+    (RetryInfo.retry_delay / Retry-After). call() blocks the calling thread
+    between attempts, so one policy object can be shared by worker threads.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=30.0,
+                 deadline=90.0, on_retry=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.on_retry = on_retry
+
+    def classify(self, exc):
+        """Map an exception to one of the error categories"""
+        errors = _api_errors()
+        if errors is not None:
+            if isinstance(exc, (errors.ResourceExhausted, errors.TooManyRequests)):
+                return RATE_LIMIT
+            if isinstance(exc, (errors.Unauthenticated, errors.PermissionDenied, errors.Unauthorized)):
+                return AUTH
+            if isinstance(exc, errors.NotFound):
+                return NOT_FOUND
+            if isinstance(exc, (errors.InvalidArgument, errors.BadRequest, errors.FailedPrecondition)):
+                return INVALID
+            if isinstance(exc, (errors.ServiceUnavailable, errors.DeadlineExceeded,
+                                errors.InternalServerError, errors.GatewayTimeout,
+                                errors.Aborted, errors.RetryError)):
+                return TRANSIENT
+        if isinstance(exc, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+            return TRANSIENT
+        return UNKNOWN
+
+    def retry_hint(self, exc):
+        """Return the server-suggested delay in seconds, if the error carries one"""
+        for detail in getattr(exc, "details", None) or []:
+            delay = getattr(detail, "retry_delay", None)
+            if delay is not None and (delay.seconds or delay.nanos):
+                return delay.seconds + delay.nanos / 1e9
+
+        response = getattr(exc, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        retry_after = headers.get("Retry-After") if hasattr(headers, "get") else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+
+        message = str(exc)
+        match = _RETRY_DELAY_RE.search(message)
+        if match:
+            return int(match.group(1)) + int(match.group(2) or 0) / 1e9
+        match = _RETRY_IN_RE.search(message)
+        if match:
+            return float(match.group(1))
+        return None
+
+    def next_delay(self, previous_delay, hint=None):
+        """Decorrelated jitter: uniform(base, previous * 3), capped, never below the hint"""
+        upper = max(self.base_delay, previous_delay * 3)
+        delay = min(self.max_delay, random.uniform(self.base_delay, upper))
+        if hint is not None:
+            delay = max(delay, hint)
+        return delay
+
+    def _plan(self, exc, attempt, previous_delay, started):
+        """Decide whether to retry; returns (category, delay or None)"""
+        category = self.classify(exc)
+        if category not in RETRYABLE or attempt >= self.max_attempts:
+            return category, None
+        delay = self.next_delay(previous_delay, self.retry_hint(exc))
+        remaining = self.deadline - (time.monotonic() - started)
+        if delay >= remaining:
+            return category, None
+        return category, delay
+
+    def _remaining(self, started):
+        return max(0.0, self.deadline - (time.monotonic() - started))
+
+    def call(self, fn, cancel_event=None):
+        """
+        Run fn(timeout) with retries, blocking the calling thread between attempts.
+        `timeout` is the remaining deadline so the transport can enforce it too.
+        Setting cancel_event aborts any pending backoff immediately.
+        """
+        cancel_event = cancel_event or threading.Event()
+        started = time.monotonic()
+        delay = self.base_delay
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return fn(self._remaining(started))
+            except Exception as e:
+                category, delay = self._plan(e, attempt, delay, started)
+                if delay is None:
+                    raise RetryError(category, e, attempt) from e
+                if self.on_retry:
+                    self.on_retry(category, attempt, delay, e)
+                if cancel_event.wait(delay):
+                    raise RetryError(category, e, attempt) from e
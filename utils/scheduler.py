@@ -0,0 +1,420 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+
+# Priority classes, highest first
+INTERACTIVE = "interactive"
+PREFETCH = "prefetch"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, PREFETCH, BATCH)
+
+DEFAULT_WEIGHTS = {INTERACTIVE: 16, PREFETCH: 4, BATCH: 1}
+
+
+class Preempted(TimeoutError):
+    """
+    A queued request was displaced by higher-priority work, or the queue was
+    full. Subclasses TimeoutError so RetryPolicy backs off and retries it.
+    """
+
+
+class Ticket:
+    __slots__ = ("priority", "user", "enqueued", "granted", "preempted", "lease")
+
+    def __init__(self, priority, user):
+        self.priority = priority
+        self.user = user
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.preempted = False
+        self.lease = None
+
+
+class SharedSlots:
+    """
+    Slot leases shared by every process pointing at the same SQLite file
+    (DECKIQ_SCHEDULER_DB), so the Streamlit app and the API server draw from
+    one pool of `slots` model calls.
+
+    Interactive calls may take any free slot. Prefetch and batch calls only
+    get one while more than `reserved` slots are free and no other process
+    has interactive work waiting. Leases and waiting counts carry an expiry
+    that a heartbeat thread renews, so a crashed process's slots come back
+    after lease_seconds. Other processes' releases are noticed by polling.
+    """
+
+    def __init__(self, path=None, slots=None, reserved=None, lease_seconds=30.0, poll_interval=0.05):
+        self.path = path or os.getenv("DECKIQ_SCHEDULER_DB", os.path.join(".deckiq", "scheduler.sqlite3"))
+        self.slots = slots or int(os.getenv("DECKIQ_MAX_CONCURRENT_CALLS", "8"))
+        self.reserved = max(1, self.slots // 4) if reserved is None else reserved
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.process = uuid.uuid4().hex
+        self.held = set()
+        self.waiting = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                id TEXT PRIMARY KEY,
+                process TEXT NOT NULL,
+                priority TEXT NOT NULL,
+                expires REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS waiting (
+                process TEXT PRIMARY KEY,
+                interactive INTEGER NOT NULL,
+                expires REAL NOT NULL
+            )
+        """)
+        threading.Thread(target=self._heartbeat, name="scheduler-heartbeat", daemon=True).start()
+
+    def lease(self, priority):
+        """Take a global slot for one call; returns the lease id, or None if the pool refuses this class now"""
+        with self.lock:
+            now = time.time()
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM leases WHERE expires < ?", (now,))
+                self.conn.execute("DELETE FROM waiting WHERE expires < ?", (now,))
+                busy = self.conn.execute("SELECT COUNT(*) FROM leases").fetchone()[0]
+                if priority == INTERACTIVE:
+                    admitted = busy < self.slots
+                else:
+                    admitted = busy < self.slots - self.reserved and not self.conn.execute(
+                        "SELECT 1 FROM waiting WHERE process != ? AND interactive > 0 LIMIT 1", (self.process,)
+                    ).fetchone()
+                lease = None
+                if admitted:
+                    lease = uuid.uuid4().hex
+                    self.conn.execute(
+                        "INSERT INTO leases (id, process, priority, expires) VALUES (?, ?, ?, ?)",
+                        (lease, self.process, priority, now + self.lease_seconds)
+                    )
+                    self.held.add(lease)
+                self.conn.execute("COMMIT")
+                return lease
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def release(self, lease):
+        with self.lock:
+            # Forget it first: if the delete fails the lease still expires instead of being renewed
+            self.held.discard(lease)
+            self.conn.execute("DELETE FROM leases WHERE id = ?", (lease,))
+
+    def publish_waiting(self, interactive):
+        """Advertise how many interactive calls this process has queued"""
+        with self.lock:
+            if interactive == self.waiting:
+                return
+            self.waiting = interactive
+            if interactive:
+                self.conn.execute(
+                    "INSERT INTO waiting (process, interactive, expires) VALUES (?, ?, ?) "
+                    "ON CONFLICT (process) DO UPDATE SET interactive = excluded.interactive, expires = excluded.expires",
+                    (self.process, interactive, time.time() + self.lease_seconds)
+                )
+            else:
+                self.conn.execute("DELETE FROM waiting WHERE process = ?", (self.process,))
+
+    def _heartbeat(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            with self.lock:
+                expires = time.time() + self.lease_seconds
+                for lease in list(self.held):
+                    self.conn.execute("UPDATE leases SET expires = ? WHERE id = ?", (expires, lease))
+                if self.waiting:
+                    self.conn.execute("UPDATE waiting SET expires = ? WHERE process = ?", (expires, self.process))
+
+    def close(self):
+        """Stop the heartbeat and give back this process's leases"""
+        self.stopped.set()
+        with self.lock:
+            self.conn.execute("DELETE FROM leases WHERE process = ?", (self.process,))
+            self.conn.execute("DELETE FROM waiting WHERE process = ?", (self.process,))
+            self.held.clear()
+            self.waiting = 0
+
+    def stats(self):
+        """Slots in use per class and interactive calls waiting, across all processes"""
+        with self.lock:
+            now = time.time()
+            in_flight = dict(self.conn.execute(
+                "SELECT priority, COUNT(*) FROM leases WHERE expires >= ? GROUP BY priority", (now,)
+            ).fetchall())
+            waiting = self.conn.execute(
+                "SELECT COALESCE(SUM(interactive), 0) FROM waiting WHERE expires >= ?", (now,)
+            ).fetchone()[0]
+        return {
+            "slots": self.slots,
+            "reserved_interactive": self.reserved,
+            "in_flight": {p: in_flight.get(p, 0) for p in PRIORITIES},
+            "interactive_waiting": waiting,
+        }
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class FairScheduler:
+    """
+    Admission control for model calls: at most `slots` calls run at once and
+    waiting calls are ordered by weighted fair queuing.
+
+    Classes share slots in proportion to their weights (interactive 16,
+    prefetch 4, batch 1 by default; DECKIQ_SCHEDULER_WEIGHTS overrides), and
+    users within a class get equal shares, so one large batch or one
+    session's map-reduce burst cannot starve everyone else. `reserved` slots
+    are only ever given to interactive calls, keeping button clicks fast
+    while batch work soaks up the remaining capacity. When the queue is
+    full, the newest queued request of a lower class is preempted.
+
+    With `shared` (a SharedSlots), each granted call also takes a lease from
+    the cross-process pool, so these limits hold across the app and the API
+    server; without it they only apply within this process.
+    """
+
+    def __init__(self, slots=None, weights=None, reserved=None, max_queued=None, window=500, shared=None):
+        self.slots = slots or int(os.getenv("DECKIQ_MAX_CONCURRENT_CALLS", "8"))
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights if weights is not None else self._load_weights()))
+        self.reserved = max(1, self.slots // 4) if reserved is None else reserved
+        self.max_queued = max_queued or int(os.getenv("DECKIQ_MAX_QUEUED_CALLS", "256"))
+        self.shared = shared
+        self.next_poll = 0.0
+
+        # priority -> OrderedDict(user -> deque of tickets)
+        self.queues = {p: OrderedDict() for p in PRIORITIES}
+        # Virtual finish tags for classes and for users within each class
+        self.class_tags = {p: 0.0 for p in PRIORITIES}
+        self.class_clock = 0.0
+        self.user_tags = {p: {} for p in PRIORITIES}
+        self.user_clocks = {p: 0.0 for p in PRIORITIES}
+
+        self.in_flight = {p: 0 for p in PRIORITIES}
+        self.served = {p: 0 for p in PRIORITIES}
+        self.preempted = {p: 0 for p in PRIORITIES}
+        self.waits = {p: deque(maxlen=window) for p in PRIORITIES}
+        self.condition = threading.Condition()
+
+    def _load_weights(self):
+        raw = os.getenv("DECKIQ_SCHEDULER_WEIGHTS", "").strip()
+        return json.loads(raw) if raw else {}
+
+    def _queued(self, priority=None):
+        priorities = [priority] if priority else PRIORITIES
+        return sum(len(tickets) for p in priorities for tickets in self.queues[p].values())
+
+    def _enqueue(self, ticket):
+        users = self.queues[ticket.priority]
+        if not users:
+            # A class returning from idle starts at the current virtual time (no banked credit)
+            self.class_tags[ticket.priority] = max(self.class_tags[ticket.priority], self.class_clock)
+        if ticket.user not in users:
+            tags = self.user_tags[ticket.priority]
+            tags[ticket.user] = max(tags.get(ticket.user, 0.0), self.user_clocks[ticket.priority])
+            users[ticket.user] = deque()
+        users[ticket.user].append(ticket)
+
+    def _remove(self, ticket):
+        users = self.queues[ticket.priority]
+        tickets = users.get(ticket.user)
+        if tickets is None or ticket not in tickets:
+            return
+        tickets.remove(ticket)
+        if not tickets:
+            del users[ticket.user]
+
+    def _preempt_for(self, ticket):
+        """Queue is full: displace the newest queued ticket of the lowest class below this one"""
+        rank = PRIORITIES.index(ticket.priority)
+        for priority in reversed(PRIORITIES[rank + 1:]):
+            users = self.queues[priority]
+            if not users:
+                continue
+            tags = self.user_tags[priority]
+            user = max(users, key=lambda u: tags.get(u, 0.0))
+            victim = users[user].pop()
+            if not users[user]:
+                del users[user]
+            victim.preempted = True
+            self.preempted[priority] += 1
+            # Wake the displaced waiter so it fails over now instead of at its timeout
+            self.condition.notify_all()
+            return True
+        return False
+
+    def _choose(self, allowed):
+        """Class of the next ticket by weighted fair queuing (None if nothing can run)"""
+        free = self.slots - sum(self.in_flight.values())
+        if free <= 0:
+            return None
+        candidates = [p for p in allowed if self.queues[p]]
+        if free <= self.reserved:
+            candidates = [p for p in candidates if p == INTERACTIVE]
+        if not candidates:
+            return None
+        return min(
+            candidates,
+            key=lambda p: (self.class_tags[p] + 1.0 / self.weights[p], PRIORITIES.index(p))
+        )
+
+    def _take(self, priority):
+        """Dequeue the next ticket of a class, fairly across its users"""
+        self.class_clock = self.class_tags[priority]
+        self.class_tags[priority] += 1.0 / self.weights[priority]
+
+        users = self.queues[priority]
+        tags = self.user_tags[priority]
+        user = min(users, key=lambda u: tags[u])
+        self.user_clocks[priority] = tags[user]
+        tags[user] += 1.0
+
+        ticket = users[user].popleft()
+        if not users[user]:
+            del users[user]
+            # Forget idle users that carry no extra debt; they rejoin at the clock anyway
+            for idle in [u for u, tag in tags.items() if u not in users and tag <= self.user_clocks[priority]]:
+                del tags[idle]
+        return ticket
+
+    def _dispatch(self):
+        granted = False
+        allowed = list(PRIORITIES)
+        while True:
+            priority = self._choose(allowed)
+            if priority is None:
+                break
+            lease = None
+            if self.shared is not None:
+                lease = self.shared.lease(priority)
+                if lease is None:
+                    # The pool admits by class rank, so lower classes would be refused too
+                    allowed = allowed[:allowed.index(priority)]
+                    continue
+            ticket = self._take(priority)
+            ticket.granted = True
+            ticket.lease = lease
+            self.in_flight[ticket.priority] += 1
+            self.served[ticket.priority] += 1
+            self.waits[ticket.priority].append(time.monotonic() - ticket.enqueued)
+            granted = True
+        if self.shared is not None:
+            self.shared.publish_waiting(self._queued(INTERACTIVE))
+        return granted
+
+    def acquire(self, priority=INTERACTIVE, user="default", timeout=None):
+        """
+        Wait for a slot and return the ticket to pass to release().
+        Raises Preempted if displaced (or the queue is full) and TimeoutError
+        if no slot frees up within timeout seconds.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        ticket = Ticket(priority, user)
+        deadline = None if timeout is None else ticket.enqueued + timeout
+
+        with self.condition:
+            if self._queued() >= self.max_queued and not self._preempt_for(ticket):
+                self.preempted[priority] += 1
+                raise Preempted("Model request queue is full")
+            self._enqueue(ticket)
+            if self._dispatch():
+                self.condition.notify_all()
+
+            while not (ticket.granted or ticket.preempted):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._remove(ticket)
+                    if self.shared is not None:
+                        self.shared.publish_waiting(self._queued(INTERACTIVE))
+                    raise TimeoutError(f"Timed out waiting for a model slot ({priority})")
+                if self.shared is None:
+                    self.condition.wait(remaining)
+                    continue
+                # Slots freed by other processes are only seen by polling the pool
+                poll = self.shared.poll_interval
+                self.condition.wait(poll if remaining is None else min(remaining, poll))
+                if time.monotonic() >= self.next_poll:
+                    self.next_poll = time.monotonic() + poll
+                    if self._dispatch():
+                        self.condition.notify_all()
+
+            if ticket.preempted:
+                raise Preempted(f"Queued {priority} request was preempted by higher-priority work")
+            return ticket
+
+    def release(self, ticket):
+        with self.condition:
+            self.in_flight[ticket.priority] -= 1
+            if ticket.lease is not None:
+                self.shared.release(ticket.lease)
+            self._dispatch()
+            self.condition.notify_all()
+
+    @contextmanager
+    def admit(self, priority=INTERACTIVE, user="default", timeout=None):
+        """Hold a slot for the duration of the block"""
+        ticket = self.acquire(priority, user, timeout)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        """Queue-depth and wait-time gauges per priority class (plus the cross-process pool, if shared)"""
+        with self.condition:
+            stats = {
+                "slots": self.slots,
+                "reserved_interactive": self.reserved,
+                "in_flight": sum(self.in_flight.values()),
+                "queued": self._queued(),
+                "classes": {
+                    p: {
+                        "weight": self.weights[p],
+                        "queued": self._queued(p),
+                        "users_waiting": len(self.queues[p]),
+                        "in_flight": self.in_flight[p],
+                        "served": self.served[p],
+                        "preempted": self.preempted[p],
+                        "wait_p50": round(_percentile(self.waits[p], 50), 3),
+                        "wait_p95": round(_percentile(self.waits[p], 95), 3),
+                    }
+                    for p in PRIORITIES
+                },
+            }
+        if self.shared is not None:
+            stats["shared"] = self.shared.stats()
+        return stats
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide FairScheduler shared by all helpers, drawing slots from the cross-process pool"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = FairScheduler(shared=SharedSlots())
+        return _shared
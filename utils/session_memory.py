@@ -0,0 +1,168 @@
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+
+def approximate_size(value):
+    """Rough in-memory size of an artifact in bytes"""
+    if isinstance(value, (str, bytes, bytearray)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            approximate_size(k) + approximate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(approximate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def memory_budget_bytes():
+    """Process memory budget for cached artifacts (DECKIQ_MEMORY_BUDGET_MB, default 512)"""
+    return int(float(os.getenv("DECKIQ_MEMORY_BUDGET_MB", "512")) * 1024 * 1024)
+
+
+# Shares of the memory budget held by the process-wide caches derived from
+# uploads; per-session artifacts get the rest
+CACHE_SHARES = {
+    "thumbnails": 0.15,
+    "ocr": 0.05,
+    "chunk_notes": 0.05,
+    "facts": 0.02,
+}
+
+_caches = weakref.WeakSet()
+_caches_lock = threading.Lock()
+
+
+class SizedLRU:
+    """
+    Thread-safe LRU bounded by approximate bytes (the cache's share of the
+    memory budget) as well as by entry count. Live caches are tracked so
+    their usage can be reported next to the session artifacts.
+    """
+
+    def __init__(self, name, max_entries=None, max_bytes=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes or int(memory_budget_bytes() * CACHE_SHARES.get(name, 0.05))
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        with _caches_lock:
+            _caches.add(self)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size=None):
+        size = approximate_size(value) if size is None else size
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes or (self.max_entries and len(self.entries) > self.max_entries):
+                self.total_bytes -= self.entries.popitem(last=False)[1][1]
+
+    def usage(self):
+        with self.lock:
+            return self.total_bytes
+
+
+def cache_usage():
+    """Bytes held by the live caches, per cache name"""
+    with _caches_lock:
+        caches = list(_caches)
+    usage = {}
+    for cache in caches:
+        usage[cache.name] = usage.get(cache.name, 0) + cache.usage()
+    return usage
+
+
+class SessionArtifactStore:
+    """
+    Process-wide store for per-session artifacts (deck text, outputs, ...)
+    with approximate memory accounting.
+
+    Every artifact is tracked in one LRU across all sessions; when the total
+    exceeds the budget (what DECKIQ_MEMORY_BUDGET_MB leaves after the
+    CACHE_SHARES of the shared caches) the least recently used artifacts are
+    evicted, whichever session owns them. Evicted artifacts are simply
+    recomputed on the next access. prune() releases sessions that have ended.
+    """
+
+    def __init__(self, budget_bytes=None):
+        self.budget_bytes = budget_bytes or int(memory_budget_bytes() * (1 - sum(CACHE_SHARES.values())))
+        self.entries = OrderedDict()
+        self.session_bytes = {}
+        self.total_bytes = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, session_id, key):
+        with self.lock:
+            entry = self.entries.get((session_id, key))
+            if entry is None:
+                return None
+            self.entries.move_to_end((session_id, key))
+            return entry[0]
+
+    def put(self, session_id, key, value):
+        """Store an artifact; returns False if it alone exceeds the budget and was not kept"""
+        size = approximate_size(value)
+        with self.lock:
+            self._remove((session_id, key))
+            if size > self.budget_bytes:
+                return False
+            self.entries[(session_id, key)] = (value, size)
+            self.session_bytes[session_id] = self.session_bytes.get(session_id, 0) + size
+            self.total_bytes += size
+            while self.total_bytes > self.budget_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+            return True
+
+    def drop_session(self, session_id):
+        """Release everything a session holds"""
+        with self.lock:
+            for entry_key in [k for k in self.entries if k[0] == session_id]:
+                self._remove(entry_key)
+
+    def prune(self, is_active):
+        """Drop every session for which is_active(session_id) is False; returns how many"""
+        with self.lock:
+            ended = [session_id for session_id in self.session_bytes if not is_active(session_id)]
+        for session_id in ended:
+            self.drop_session(session_id)
+        return len(ended)
+
+    def usage(self, session_id=None):
+        """Bytes held by one session, or by the whole process (session artifacts plus shared caches)"""
+        if session_id is None:
+            shared = sum(cache_usage().values())
+            with self.lock:
+                return self.total_bytes + shared
+        with self.lock:
+            return self.session_bytes.get(session_id, 0)
+
+    def _remove(self, entry_key):
+        entry = self.entries.pop(entry_key, None)
+        if entry is None:
+            return
+        session_id = entry_key[0]
+        self.total_bytes -= entry[1]
+        remaining = self.session_bytes.get(session_id, 0) - entry[1]
+        if remaining > 0:
+            self.session_bytes[session_id] = remaining
+        else:
+            self.session_bytes.pop(session_id, None)
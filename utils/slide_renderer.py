@@ -0,0 +1,145 @@
+import atexit
+import hashlib
+import os
+import threading
+
+from utils.profiling import profiled
+from utils.session_memory import SizedLRU
+
+
+# Gemini bills an image whose sides are both <= 384px as a flat 258 tokens;
+# larger images are tiled and cost a multiple of that
+IMAGE_TOKENS = 258
+THUMBNAIL_SIDE = 384
+
+
+def image_token_budget():
+    """Image-token budget per request (DECKIQ_SLIDE_IMAGE_TOKENS, default 8 thumbnails)"""
+    return int(os.getenv("DECKIQ_SLIDE_IMAGE_TOKENS", str(8 * IMAGE_TOKENS)))
+
+
+def select_pages(page_count, token_budget=None, tokens_per_image=IMAGE_TOKENS):
+    """
+    Pick which slides to send within the image-token budget: all of them if
+    they fit, otherwise an evenly spaced subset that always includes the
+    first and last slide. Returns 0-based page numbers.
+    """
+    token_budget = image_token_budget() if token_budget is None else token_budget
+    limit = min(page_count, token_budget // tokens_per_image)
+    if limit <= 0:
+        return []
+    if limit >= page_count:
+        return list(range(page_count))
+    if limit == 1:
+        return [0]
+    step = (page_count - 1) / (limit - 1)
+    return sorted({round(i * step) for i in range(limit)})
+
+
+def _render_pages(data, pages, max_side, quality):
+    """Render pages of a PDF to JPEG thumbnails; runs in-process or in a pool worker"""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        rendered = []
+        for number in pages:
+            page = doc[number]
+            # Lowest DPI that still fills max_side on the longer edge
+            scale = max_side / max(page.rect.width, page.rect.height)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+            rendered.append((number, pixmap.tobytes("jpeg", jpg_quality=quality)))
+        return rendered
+    finally:
+        doc.close()
+
+
+class SlideRenderer:
+    """
+    Lazy, cached slide thumbnails for multimodal prompts (PDF decks).
+
+    Only the requested pages are rendered, at the lowest scale that fits
+    max_side, and each thumbnail is cached by (deck hash, page, size), within
+    the thumbnails share of the memory budget, so a later request renders
+    only the pages it has not seen. PyMuPDF holds the
+    GIL while rendering, so larger batches go to a process pool; small ones
+    render in-process to avoid the round trip.
+    """
+
+    def __init__(self, max_side=THUMBNAIL_SIDE, quality=70, max_workers=None,
+                 parallel_threshold=4, cache_entries=512):
+        self.max_side = max_side
+        self.quality = quality
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.parallel_threshold = parallel_threshold
+        self.cache = SizedLRU("thumbnails", max_entries=cache_entries)
+        self.pool = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def deck_hash(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def page_count(self, data):
+        import fitz  # PyMuPDF
+
+        doc = fitz.open(stream=data, filetype="pdf")
+        try:
+            return doc.page_count
+        finally:
+            doc.close()
+
+    def _get_pool(self):
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+
+        with self.lock:
+            if self.pool is None:
+                # spawn: forking a threaded server process is unsafe
+                self.pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+                atexit.register(self.pool.shutdown, wait=False)
+            return self.pool
+
+    def _render_missing(self, data, pages):
+        if self.max_workers <= 1 or len(pages) <= self.parallel_threshold:
+            return _render_pages(data, pages, self.max_side, self.quality)
+
+        groups = [pages[i::self.max_workers] for i in range(self.max_workers)]
+        pool = self._get_pool()
+        futures = [pool.submit(_render_pages, data, group, self.max_side, self.quality) for group in groups if group]
+        return [item for future in futures for item in future.result()]
+
+    @profiled("render_slides")
+    def render(self, data, pages):
+        """Return [(page_number, jpeg_bytes)] for the requested 0-based pages, in order"""
+        digest = self.deck_hash(data)
+        found = {}
+        for number in pages:
+            image = self.cache.get((digest, number, self.max_side))
+            if image is not None:
+                found[number] = image
+
+        missing = [number for number in pages if number not in found]
+        if missing:
+            for number, image in self._render_missing(data, missing):
+                found[number] = image
+                self.cache.put((digest, number, self.max_side), image)
+
+        return [(number, found[number]) for number in pages]
+
+    def thumbnails(self, data, token_budget=None):
+        """Render the budgeted subset of slides; returns [(page_number, jpeg_bytes)]"""
+        return self.render(data, select_pages(self.page_count(data), token_budget))
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_slide_renderer():
+    """Process-wide SlideRenderer"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SlideRenderer()
+        return _shared
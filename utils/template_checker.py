@@ -1,6 +1,23 @@
 import json
 import re
 
+from utils.fact_extractor import extract_facts
+from utils.profiling import profiled
+
+
+# Extracted metrics that count as evidence for a section even without keywords
+FACT_SECTIONS = {
+    # Not 'growth': a growth rate is as often the market's ("$15B market growing 25%") as the company's
+    'traction': ['mrr', 'arr', 'customers', 'users', 'retention'],
+    'market': ['tam', 'sam', 'som'],
+    'market size': ['tam', 'sam', 'som'],
+    'business model': ['mrr', 'arr', 'gross_margin', 'cac', 'ltv'],
+    'financials': ['revenue', 'arr', 'gross_margin'],
+    'financial model': ['gross_margin', 'cac', 'ltv', 'churn'],
+    'ask': ['raise'],
+    'funding ask': ['raise', 'valuation'],
+}
+
 class TemplateChecker:
     def __init__(self):
         self.templates = self._load_templates()
@@ -59,7 +76,8 @@ class TemplateChecker:
 
         return templates
 
-    def check_template_gaps(self, deck_text, template_name):
+    @profiled("template_check")
+    def check_template_gaps(self, deck_text, template_name, facts=None):
         """
         Check what sections are missing from the deck compared to template
         Returns list of missing required sections
@@ -69,9 +87,14 @@ class TemplateChecker:
 
         template = self.templates[template_name]
         deck_lower = deck_text.lower()
+        facts = facts if facts is not None else extract_facts(deck_text)
         missing = []
 
         for section in template['required_sections']:
+            # Extracted metrics are direct evidence of the section
+            if any(metric in facts for metric in FACT_SECTIONS.get(section, [])):
+                continue
+
             # Get keywords for this section
             keywords = self._get_section_keywords(section)
 
@@ -189,14 +212,14 @@ class TemplateChecker:
         """Return all available templates"""
         return list(self.templates.keys())
 
-    def calculate_coverage_score(self, deck_text, template_name):
+    def calculate_coverage_score(self, deck_text, template_name, facts=None):
         """Calculate what percentage of required sections are covered"""
         if template_name not in self.templates:
             return 0
 
         template = self.templates[template_name]
         total_sections = len(template['required_sections'])
-        missing_sections = len(self.check_template_gaps(deck_text, template_name))
+        missing_sections = len(self.check_template_gaps(deck_text, template_name, facts))
 
         coverage = ((total_sections - missing_sections) / total_sections) * 100
         return round(coverage, 1)
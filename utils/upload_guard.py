@@ -0,0 +1,67 @@
+import io
+import os
+import zipfile
+
+
+def _limit(name, default):
+    return float(os.getenv(name, default))
+
+
+MAX_UPLOAD_MB = _limit("MAX_UPLOAD_SIZE", "10")
+MAX_PAGES = int(_limit("DECKIQ_MAX_PAGES", "150"))
+# PPTX archives: cap on total uncompressed size, entry count and per-entry compression ratio
+MAX_UNCOMPRESSED_MB = _limit("DECKIQ_MAX_UNCOMPRESSED_MB", "200")
+MAX_ZIP_ENTRIES = 5000
+MAX_COMPRESSION_RATIO = 100
+
+
+class UploadRejected(ValueError):
+    """Raised when an upload exceeds a size, page or archive limit"""
+
+
+def max_upload_bytes():
+    return int(MAX_UPLOAD_MB * 1024 * 1024)
+
+
+def check_upload_size(size):
+    """Reject by declared size before the file is read into memory"""
+    if size is not None and size > max_upload_bytes():
+        raise UploadRejected(
+            f"File is {size / (1024 * 1024):.1f}MB; the maximum upload size is {MAX_UPLOAD_MB:g}MB."
+        )
+
+
+def check_page_count(count, unit="pages"):
+    if count > MAX_PAGES:
+        raise UploadRejected(f"Deck has {count} {unit}; the maximum is {MAX_PAGES}.")
+
+
+def check_pptx_archive(data):
+    """
+    Inspect the PPTX zip directory (no decompression) before python-pptx
+    parses it: rejects zip bombs, absurd entry counts and too many slides.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise UploadRejected("File is not a valid PowerPoint (.pptx) document.")
+
+    with archive:
+        entries = archive.infolist()
+        if len(entries) > MAX_ZIP_ENTRIES:
+            raise UploadRejected(f"PowerPoint archive has {len(entries)} entries; the maximum is {MAX_ZIP_ENTRIES}.")
+
+        total = 0
+        slides = 0
+        for entry in entries:
+            total += entry.file_size
+            if entry.compress_size and entry.file_size / entry.compress_size > MAX_COMPRESSION_RATIO:
+                raise UploadRejected("PowerPoint archive has a suspicious compression ratio and was rejected.")
+            if entry.filename.startswith("ppt/slides/slide") and entry.filename.endswith(".xml"):
+                slides += 1
+
+        if total > MAX_UNCOMPRESSED_MB * 1024 * 1024:
+            raise UploadRejected(
+                f"PowerPoint expands to {total / (1024 * 1024):.0f}MB; the maximum is {MAX_UNCOMPRESSED_MB:g}MB."
+            )
+        check_page_count(slides, "slides")